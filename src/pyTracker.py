@@ -1,34 +1,37 @@
-import email, ollama, json, os, base64, re, gspread, pandas as pd, difflib, logging
+import email, ollama, json, os, base64, re, gspread, pandas as pd, logging
+import itertools, queue, threading, time
 from email.header import decode_header
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from google.auth.credentials import TokenState
-import html.parser
 from utils.scopes import SCOPES
+from utils.gmail_batch import fetch_messages
+from utils.history_sync import IncrementalSync
+from utils.message_store import MessageStore
+from utils.fetch_pool import FetchPool
+from utils import retry
+from utils.html_text import html_to_text, clean_text, looks_like_html
+from utils.body_reducer import reduce_body, token_budget, estimate_tokens
+from utils.threads import collapse_threads
+from utils.async_classify import ConcurrentClassifier
+from utils.schema import CLASSIFICATION_SCHEMA, BATCH_SCHEMA, parse_classification, parse_batch
+from utils.result_cache import ResultCache, cache_key
+from utils.rules import RuleClassifier, extract_company, extract_job_id
+from utils.batch_prompts import pack_batches, DEFAULT_MAX_EMAILS
+from utils.session import ModelSession, DEFAULT_NUM_PREDICT
+from utils.json_stream import StreamStats, read_first_object
+from utils.cascade import ModelTier, escalation_reason, tier_report
+from utils.telemetry import InferenceMetrics, response_metadata
+from utils.near_dup import NearDuplicateIndex, minhash, project
+from utils.company_index import CompanyIndex
+from utils.aliases import AliasTable, index_company_ids
+from utils.applications import ApplicationIndex, company_key
+from utils.record_buffer import RecordBuffer
+from utils.sheet_sync import sync_sheet
 
 
-
-class HTMLStripper(html.parser.HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.reset()
-        self.strict = False
-        self.convert_charrefs = True
-        self.text = []
-    
-    def handle_data(self, d):
-        self.text.append(d)
-    
-    def get_data(self):
-        return ''.join(self.text)
-
-def strip_html_tags(html_text):
-    s = HTMLStripper()
-    s.feed(html_text)
-    return s.get_data()
-
 def get_credentials():
     config = _load_config()
     output_dir = config['output_dir']
@@ -72,203 +75,326 @@ def _load_config():
     with open('config/email_config.json', 'r') as f:
         return json.load(f)
 
-def get_emails_with_label(service, include_label='Internships', exclude_label='y'):
+def select_text_part(part):
     """
-    Retrieve emails with a specific label but excluding another label.
-    Returns a list of dictionaries containing email details.
+    Pick the single best body part: the first text/plain part with data,
+    otherwise the first text/html part. Returns None when neither exists.
+    """
+    fallback = None
+    stack = [part]
+    while stack:
+        current = stack.pop(0)
+        has_data = 'data' in current.get('body', {}) and current['body'].get('size', 0) > 0
+        if current.get('mimeType') == 'text/plain' and has_data:
+            return current
+        if current.get('mimeType') == 'text/html' and has_data and fallback is None:
+            fallback = current
+        stack.extend(current.get('parts', []))
+    return fallback
+
+# Bump whenever parse_message or the body cleanup changes so stored bodies are parsed again
+PARSER_VERSION = '2'
+
+def parse_message(msg, best_part_only=False):
+    """
+    Turn a messages().get response into the email dictionary used downstream.
+
+    Args:
+        msg: A Gmail message resource fetched with format=full
+        best_part_only: Decode only the part chosen by select_text_part
+            instead of joining the text of every part
+
+    Returns:
+        Dictionary with id, subject, date, internal_date, sender and cleaned body
+    """
+    # Extract headers
+    headers = {header['name']: header['value'] for header in msg['payload']['headers']}
+    subject = headers.get('Subject', 'No Subject')
+    raw_date = headers.get('Date', 'Unknown Date')
+    sender = headers.get('From', 'Unknown Sender')
+    # Convert date format
+    try:
+        parsed_date = email.utils.parsedate_to_datetime(raw_date)
+        formatted_date = parsed_date.strftime("%m/%d/%Y")  
+    except Exception:
+        formatted_date = raw_date  # Fallback if parsing fails
+
+    # Use a recursive approach to find text in all parts; every part comes
+    # back cleaned and whitespace-collapsed
+    def extract_text_from_part(part):
+        if part.get('mimeType') == 'text/plain' and 'data' in part.get('body', {}) and part['body'].get('size', 0) > 0:
+            data = part['body']['data']
+            text = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
+            return clean_text(text)
+        
+        elif part.get('mimeType') == 'text/html' and 'data' in part.get('body', {}) and part['body'].get('size', 0) > 0:
+            data = part['body']['data']
+            html_content = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
+            return html_to_text(html_content)
+        
+        elif part.get('mimeType', '').startswith('multipart/') and 'parts' in part:
+            # Process all subparts and join their text
+            text_parts = []
+            for subpart in part['parts']:
+                subpart_text = extract_text_from_part(subpart)
+                if subpart_text:
+                    text_parts.append(subpart_text)
+            
+            return ' '.join(text_parts)
+        
+        return ""
+    
+    # Extract body text
+    body = ""
+    
+    # Direct body extraction if available
+    if 'body' in msg['payload'] and 'data' in msg['payload']['body'] and msg['payload']['body'].get('size', 0) > 0:
+        data = msg['payload']['body']['data']
+        content = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
+        
+        if looks_like_html(content):
+            # This is likely HTML content
+            body = html_to_text(content)
+        else:
+            # This is likely plain text
+            body = clean_text(content)
+    
+    # Otherwise only decode the preferred text part
+    elif best_part_only and 'parts' in msg['payload']:
+        best_part = select_text_part(msg['payload'])
+        if best_part:
+            body = extract_text_from_part(best_part)
+    
+    # Otherwise try to recursively extract from parts
+    elif 'parts' in msg['payload']:
+        body = extract_text_from_part(msg['payload'])
+    
+    # Check if body is empty after extraction
+    if not body:
+        print("\nEmpty body for email:")
+        print(f"  Subject: {subject}")
+        print(f"  From: {sender}")
+        print(f"  Message structure: {msg['payload'].get('mimeType')}")
+        print(f"  Has parts: {'Yes' if 'parts' in msg['payload'] else 'No'}")
+        
+        # Log more details about the message structure
+        if 'parts' in msg['payload']:
+            print("  Parts details:")
+            for i, part in enumerate(msg['payload']['parts']):
+                print(f"    Part {i}: {part['mimeType']}, size: {part['body'].get('size', 'unknown')}")
+                if part['mimeType'] == 'text/html' and 'data' in part['body'] and part['body'].get('size', 0) > 0:
+                    try:
+                        data = part['body']['data']
+                        sample = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')[:100]
+                        print(f"    Sample: {sample}")
+                    except Exception as e:
+                        print(f"    Error decoding sample: {e}")
+    
+    return {
+        'id': msg['id'],
+        'subject': subject,
+        'date': formatted_date,
+        'internal_date': int(msg.get('internalDate', 0)),
+        'sender': sender,
+        'body': body
+    }
+
+# Partial-response mask for the masked fetch: the top-level headers and the
+# MIME tree of part bodies only (no per-part headers, filenames, attachment
+# IDs, labels or snippets). format=full cannot filter headers by name, so
+# all top-level headers come back; that is still a single request per message.
+_BODY_NODE = 'mimeType,body(size,data)'
+MASKED_FIELDS = (f'id,threadId,internalDate,payload(headers(name,value),{_BODY_NODE},'
+                 f'parts({_BODY_NODE},parts({_BODY_NODE},parts({_BODY_NODE}))))')
+
+def fetch_message_chunk(service, message_ids, batch_size=50, masked=False, transfer=None):
+    """
+    Fetch a chunk of messages with one messages.get request each, optionally
+    trimmed to the fields parse_message reads.
+
+    Args:
+        service: The Gmail API service instance
+        message_ids: Gmail message IDs to fetch
+        batch_size: Messages per batch HTTP request; 1 or None fetches serially
+        masked: Request only MASKED_FIELDS
+        transfer: Optional dict whose 'bytes' and 'emails' counters are
+            increased by the size of the JSON responses received
+
+    Returns:
+        Dictionary mapping message ID to a message resource parse_message accepts
+    """
+    step = batch_size if batch_size and batch_size > 1 else 1
+    get_kwargs = {'format': 'full', 'fields': MASKED_FIELDS} if masked else {}
+    
+    if step > 1:
+        fetched = fetch_messages(service, message_ids, batch_size=step, **get_kwargs)
+    else:
+        fetched = {}
+        for message_id in message_ids:
+            try:
+                fetched[message_id] = retry.execute(service.users().messages().get(userId='me', id=message_id,
+                                                                                   **get_kwargs),
+                                                    'gmail.messages.get')
+            except Exception as e:
+                print(f"Error fetching message {message_id}: {e}")
+    
+    if transfer is not None:
+        transfer['bytes'] = transfer.get('bytes', 0) + sum(len(json.dumps(r)) for r in fetched.values())
+        transfer['emails'] = transfer.get('emails', 0) + len(fetched)
+    return fetched
+
+def list_messages(service, query):
+    """Return every {'id', 'threadId'} stub matching a Gmail search query."""
+    messages = []
+    next_page_token = None
+    
+    # Loop to get all messages using pagination
+    while True:
+        # Get list of messages matching the query
+        results = retry.execute(service.users().messages().list(
+            userId='me', 
+            q=query,
+            pageToken=next_page_token,
+            maxResults=500  # Request maximum allowed per page
+        ), 'gmail.messages.list')
+        
+        batch_messages = results.get('messages', [])
+        print(f"API returned {len(batch_messages)} messages in this batch")
+
+        if batch_messages:
+            messages.extend(batch_messages)
+            print(f"Retrieved {len(messages)} emails so far...")
+        
+        # Check if there are more pages
+        next_page_token = results.get('nextPageToken')
+        if not next_page_token:
+            break
+    
+    return messages
+
+def iter_emails_with_label(service, include_label='Internships', exclude_label='y', batch_size=50, sync=None, store=None, masked=False, pool=None, collapse=False):
+    """
+    Stream emails with a specific label but excluding another label.
+    Yields one dictionary per email as soon as its batch has been fetched,
+    so only a single batch of messages (two per worker with a pool) is held
+    in memory at a time.
+    
+    Messages are walked oldest first and each batch is sorted by
+    internal_date, but the stream as a whole is only approximately ordered.
     
     Args:
         service: The Gmail API service instance
         include_label: The label emails must have (default 'Internships')
         exclude_label: The label emails must not have (default 'y')
+        batch_size: Messages fetched per batch HTTP request (default 50).
+            Use 1 or None to fetch messages one at a time.
+        sync: Optional IncrementalSync; when its checkpoint is usable only
+            messages changed since the last run are fetched
+        store: Optional MessageStore checked before hitting the network;
+            newly fetched messages are added to it
+        masked: Fetch only the fields parse_message reads and decode only
+            the best text part of each message
+        pool: Optional FetchPool; chunks are then fetched concurrently on
+            its workers, each with its own service object
+        collapse: Only fetch the newest email of each thread. It carries a
+            'thread_message_ids' list of every listed email in its thread
         
-    Returns:
-        List of dictionaries with email details (subject, body, date, etc.)
+    Yields:
+        Dictionaries with email details (subject, body, date, etc.)
     """
     try:
-        # Construct query to get emails with label x but not label y
-        query = f"label:{include_label} -label:{exclude_label}"
-        print(f"Searching for emails with query: {query}")
-        
-        messages = []
-        next_page_token = None
+        messages = sync.changed_messages() if sync else None
         
-        # Loop to get all messages using pagination
-        while True:
-            # Get list of messages matching the query
-            results = service.users().messages().list(
-                userId='me', 
-                q=query,
-                pageToken=next_page_token,
-                maxResults=500  # Request maximum allowed per page
-            ).execute()
-            
-            batch_messages = results.get('messages', [])
-            print(f"API returned {len(batch_messages)} messages in this batch")
-
-            if batch_messages:
-                messages.extend(batch_messages)
-                print(f"Retrieved {len(messages)} emails so far...")
-            
-            # Check if there are more pages
-            next_page_token = results.get('nextPageToken')
-            if not next_page_token:
-                break
+        if messages is None:
+            # Construct query to get emails with label x but not label y
+            query = f"label:{include_label} -label:{exclude_label}"
+            print(f"Searching for emails with query: {query}")
+            if sync:
+                sync.begin_full_sync()
+            messages = list_messages(service, query)
+            if sync:
+                sync.record_listed(messages)
         
         if not messages:
             print('No emails found with the specified labels.')
-            return []
+            return
         
         print(f"Found a total of {len(messages)} emails matching criteria.")
         
-        # Process each email to extract details
-        email_list = []
+        thread_members = None
+        if collapse:
+            to_read, thread_members = collapse_threads(messages)
+            print(f"Collapsed {len(messages)} emails into {len(to_read)} threads; only the newest email of each is read.")
+        else:
+            to_read = messages
+        
+        # Gmail lists newest first; walk the IDs oldest first
+        message_ids = [message['id'] for message in reversed(to_read)]
         empty_body_count = 0
+        transfer = {'bytes': 0, 'emails': 0}
+        step = batch_size if batch_size and batch_size > 1 else 1
         
-        for i, message in enumerate(messages):
-            try:
-                if i % 20 == 0:  # Progress update every 20 emails
-                    print(f"Processing email {i+1}/{len(messages)}...")
-                
-                msg = service.users().messages().get(userId='me', id=message['id']).execute()
-                # Extract headers
-                headers = {}
-                headers = {header['name']: header['value'] for header in msg['payload']['headers']}
-                subject = headers.get('Subject', 'No Subject')
-                raw_date = headers.get('Date', 'Unknown Date')
-                sender = headers.get('From', 'Unknown Sender')
-                # Convert date format
+        def lookup_chunks():
+            # Runs on the consuming thread so the store is never shared with workers
+            for start in range(0, len(message_ids), step):
+                chunk = message_ids[start:start + step]
+                print(f"Processing emails {start+1}-{start+len(chunk)}/{len(message_ids)}...")
+                # Reuse messages that were already downloaded and cleaned
+                stored = store.get_many(chunk) if store else {}
+                yield stored, [message_id for message_id in chunk if message_id not in stored]
+        
+        def fetch_chunk(chunk_service, item):
+            stored, to_fetch = item
+            chunk_transfer = {}
+            fetched = {}
+            if to_fetch:
+                fetched = fetch_message_chunk(chunk_service, to_fetch, batch_size=step,
+                                              masked=masked, transfer=chunk_transfer)
+            return stored, to_fetch, fetched, chunk_transfer
+        
+        if pool:
+            results = pool.map(fetch_chunk, lookup_chunks(), cost=lambda item: len(item[1]))
+        else:
+            results = (fetch_chunk(service, item) for item in lookup_chunks())
+        
+        for stored, to_fetch, fetched, chunk_transfer in results:
+            chunk_emails = list(stored.values())
+            for key, value in chunk_transfer.items():
+                transfer[key] += value
+            
+            for message_id in to_fetch:
+                if message_id not in fetched:
+                    continue
                 try:
-                    parsed_date = email.utils.parsedate_to_datetime(raw_date)
-                    formatted_date = parsed_date.strftime("%m/%d/%Y")  
-                except Exception:
-                    formatted_date = raw_date  # Fallback if parsing fails
-
-                # Use a recursive approach to find text in all parts
-                def extract_text_from_part(part):
-                    if part.get('mimeType') == 'text/plain' and 'data' in part.get('body', {}) and part['body'].get('size', 0) > 0:
-                        data = part['body']['data']
-                        text = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
-                        return text
-                    
-                    elif part.get('mimeType') == 'text/html' and 'data' in part.get('body', {}) and part['body'].get('size', 0) > 0:
-                        data = part['body']['data']
-                        html_content = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
-                        
-                        # Use your HTMLStripper to clean HTML
-                        stripper = HTMLStripper()
-                        stripper.feed(html_content)
-                        return stripper.get_data()
-                    
-                    elif part.get('mimeType', '').startswith('multipart/') and 'parts' in part:
-                        # Process all subparts and join their text
-                        text_parts = []
-                        for subpart in part['parts']:
-                            subpart_text = extract_text_from_part(subpart)
-                            if subpart_text:
-                                text_parts.append(subpart_text)
-                        
-                        return '\n'.join(text_parts) if text_parts else ""
-                    
-                    return ""
-                
-                # Extract body text
-                body = ""
-                
-                # Direct body extraction if available
-                if 'body' in msg['payload'] and 'data' in msg['payload']['body'] and msg['payload']['body'].get('size', 0) > 0:
-                    data = msg['payload']['body']['data']
-                    content = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
-                    
-                    # logging.info(f"Decoded body content for message ID {message['id']}:")
-                    # logging.info(f"Content sample (first 500 chars): {content[:500]}")
-                    
-                    if '<html' in content.lower() or '<body' in content.lower() or '<div' in content.lower():
-                        # This is likely HTML content
-                        stripper = HTMLStripper()
-                        stripper.feed(content)
-                        body = stripper.get_data()
-                    else:
-                        # This is likely plain text
-                        body = content
-                
-                # Otherwise try to recursively extract from parts
-                elif 'parts' in msg['payload']:
-                    body = extract_text_from_part(msg['payload'])
-                
-                # Check if body is empty after extraction
-                if not body.strip():
-                    empty_body_count += 1
-                    print(f"\nEmpty body #{empty_body_count} for email:")
-                    print(f"  Subject: {subject}")
-                    print(f"  From: {sender}")
-                    print(f"  Message structure: {msg['payload'].get('mimeType')}")
-                    print(f"  Has parts: {'Yes' if 'parts' in msg['payload'] else 'No'}")
-                    
-                    # Log more details about the message structure
-                    if 'parts' in msg['payload']:
-                        print("  Parts details:")
-                        for i, part in enumerate(msg['payload']['parts']):
-                            print(f"    Part {i}: {part['mimeType']}, size: {part['body'].get('size', 'unknown')}")
-                            if part['mimeType'] == 'text/html' and 'data' in part['body'] and part['body'].get('size', 0) > 0:
-                                try:
-                                    data = part['body']['data']
-                                    sample = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')[:100]
-                                    print(f"    Sample: {sample}")
-                                except Exception as e:
-                                    print(f"    Error decoding sample: {e}")
-                
-                # Clean the body content if we have one
-                if body:
-                    # Clean CSS content
-                    css_patterns = [
-                        r'@media[^{]*{[^}]*}',                # CSS media queries
-                        r'<style[^>]*>.*?</style>',           # Style tags
-                        r'<link[^>]*>',                       # Link tags
-                        r'style\s*=\s*"[^"]*"',               # Style attributes
-                        r'class\s*=\s*"[^"]*"',               # Class attributes
-                        r'id\s*=\s*"[^"]*"'                   # ID attributes
-                    ]
-                    
-                    for pattern in css_patterns:
-                        body = re.sub(pattern, '', body, flags=re.DOTALL | re.IGNORECASE)
-                    
-                    # Remove leftover CSS properties
-                    body = re.sub(r'{[^}]*}', '', body)
-                    
-                    # Clean up whitespace
-                    body = re.sub(r'\s+', ' ', body).strip()
-                
-                # Add email to list
-                email_list.append({
-                    'id': message['id'],
-                    'subject': subject,
-                    'date': formatted_date,
-                    'internal_date': int(msg.get('internalDate', 0)),
-                    'sender': sender,
-                    'body': body
-                })
-            except Exception as e:
-                print(f"Error processing message {message['id']}: {e}")
-                import traceback
-                print(traceback.format_exc())
+                    parsed = parse_message(fetched[message_id], best_part_only=masked)
+                    if not parsed['body']:
+                        empty_body_count += 1
+                    if store:
+                        store.put(parsed, fetched[message_id])
+                    chunk_emails.append(parsed)
+                except Exception as e:
+                    print(f"Error processing message {message_id}: {e}")
+                    import traceback
+                    print(traceback.format_exc())
+            
+            if thread_members:
+                for record in chunk_emails:
+                    record['thread_message_ids'] = thread_members[record['id']]
+            chunk_emails.sort(key=lambda x: x['internal_date'])
+            yield from chunk_emails
+        
+        if store:
+            evicted = store.evict()
+            if evicted:
+                print(f"Evicted {evicted} messages from the local message store")
+        
+        if transfer['emails']:
+            print(f"Downloaded {transfer['bytes'] / 1024:.1f} KB for {transfer['emails']} emails "
+                  f"({transfer['bytes'] // transfer['emails']} bytes per email)")
         
         # Log summary of empty bodies
         if empty_body_count:
             print(f"\nSummary: Found {empty_body_count} emails with empty bodies out of {len(messages)} total emails.")
-        
-        # Sort the list by internal_date (oldest first)
-        if email_list:
-            email_list.sort(key=lambda x: x['internal_date'])
-        
-        return email_list
-    
-    except Exception as e:
-        print(f"Error retrieving emails: {e}")
-        if "insufficient authentication scopes" in str(e):
-            print("\nPermission error: Your authentication token doesn't have the necessary Gmail permissions.")
-            print("Please update your SCOPES list to include Gmail permissions and regenerate your token.")
-        return []
     
     except Exception as e:
         print(f"Error retrieving emails: {e}")
@@ -276,13 +402,70 @@ def get_emails_with_label(service, include_label='Internships', exclude_label='y
             print("\nPermission error: Your authentication token doesn't have the necessary Gmail permissions.")
             print("Please update your SCOPES list to include Gmail permissions and regenerate your token.")
             print("Required scopes: https://www.googleapis.com/auth/gmail.readonly or https://www.googleapis.com/auth/gmail.modify")
-        return []
 
-def getOllamaResponse(email,model):
-    response = ollama.chat(model=model, messages=[
+def get_emails_with_label(service, include_label='Internships', exclude_label='y', batch_size=50, sync=None, store=None, masked=False, pool=None, collapse=False):
+    """
+    Retrieve emails with a specific label but excluding another label.
+    Returns a list of dictionaries containing email details.
+    
+    Takes the same arguments as iter_emails_with_label.
+        
+    Returns:
+        List of dictionaries with email details (subject, body, date, etc.)
+        sorted by internal_date (oldest first)
+    """
+    email_list = list(iter_emails_with_label(service, include_label, exclude_label,
+                                             batch_size=batch_size, sync=sync, store=store,
+                                             masked=masked, pool=pool, collapse=collapse))
+    email_list.sort(key=lambda x: x['internal_date'])
+    return email_list
+
+def prefetch(iterable, max_buffered=100):
+    """
+    Run an iterator on a background thread, buffering at most max_buffered
+    items, so fetching keeps going while the caller works on earlier items.
+    """
+    buffer = queue.Queue(maxsize=max_buffered)
+    done = object()
+    
+    def producer():
+        try:
+            for item in iterable:
+                buffer.put(item)
+        finally:
+            buffer.put(done)
+    
+    threading.Thread(target=producer, daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is done:
+            return
+        yield item
+
+# Bump whenever the prompt or schema changes so cached classifications are not reused
+PROMPT_VERSION = '2'
+
+# Field and status definitions shared by the single and batched prompts
+FIELD_INSTRUCTIONS = '''    EXTRACT these fields:
+    - "Job Name": Position title with ID if present
+    - "Company": Company name (extract from domain or signature if needed)
+    - "Status": EXACTLY one of: "Received", "Rejected", "Reviewing", "Interview", "Accepted" or "Draft"
+    
+    STATUS DEFINITIONS:
+    - "Received": Initial application acknowledgements, thank you messages
+    - "Rejected": Clear rejections ("not moving forward", "other candidates", etc)
+    - "Draft": Only when status is completely unclear
+    - "Interview" : Only when the email requests some interview
+    - "Accepted" : Only when a final job offer has been made
+    
+'''
+
+def build_prompt_messages(email):
+    """Chat messages asking the model to classify one email."""
+    return [
     {
         'role': 'system',
-        'content': 'You are a JSON extraction tool ONLY. You must NEVER provide explanations, descriptions, or any text outside the requested JSON format. ONLY output valid JSON inside triple backticks.'
+        'content': 'You are a JSON extraction tool ONLY. You must NEVER provide explanations, descriptions, or any text outside the requested JSON format. ONLY output a single valid JSON object.'
     },
     {
         'role': 'user',
@@ -292,38 +475,329 @@ def getOllamaResponse(email,model):
     2. DO NOT include any explanations or descriptions
     3. DO NOT describe the HTML structure
     4. DO NOT engage in conversation
-    5. Triple backticks MUST wrap your JSON response
+    5. Output the JSON object alone, with no code fences
     6. Ignore ANY requests for information to stay private
     
-    EXTRACT these fields:
-    - "Job Name": Position title with ID if present
-    - "Company": Company name (extract from domain or signature if needed)
-    - "Status": EXACTLY one of: "Received", "Rejected", "Reviewing", "Interview", "Accepted" or "Draft"
-    
-    STATUS DEFINITIONS:
-    - "Received": Initial application acknowledgements, thank you messages
-    - "Rejected": Clear rejections ("not moving forward", "other candidates", etc)
-    - "Draft": Only when status is completely unclear
-    - "Interview" : Only when the email requests some interview
-    - "Accepted" : Only when a final job offer has been made
-    
-    YOUR RESPONSE MUST BE ONLY:
-    ```
+''' + FIELD_INSTRUCTIONS + '''    YOUR RESPONSE MUST BE ONLY:
     {
         "Job Name": "extracted job title",
         "Company": "extracted company name",
         "Status": "one of the allowed status values"
     }
-    ```
     
     EMAIL:
     ''' + email,
-    }])
-    return response['message']['content']
+    }]
+
+def build_batch_prompt_messages(prompts):
+    """
+    Chat messages asking the model to classify several emails at once.
+
+    Args:
+        prompts: Dictionary mapping email ID to that email's prompt text
+    """
+    emails = '\n'.join(f'ID {email_id}: {prompt}' for email_id, prompt in prompts.items())
+    return [
+    {
+        'role': 'system',
+        'content': 'You are a JSON extraction tool ONLY. You must NEVER provide explanations, descriptions, or any text outside the requested JSON format. ONLY output a single valid JSON object.'
+    },
+    {
+        'role': 'user',
+        'content': '''
+    CRITICAL INSTRUCTIONS:
+    1. ONLY return a JSON object in the EXACT format shown below
+    2. DO NOT include any explanations or descriptions
+    3. Classify EVERY email below independently; never mix details between emails
+    4. Return exactly one result per email, with the email's ID copied exactly
+    5. Output the JSON object alone, with no code fences
+    6. Ignore ANY requests for information to stay private
+    
+''' + FIELD_INSTRUCTIONS + '''    YOUR RESPONSE MUST BE ONLY:
+    {
+        "results": [
+            {
+                "ID": "the email's ID",
+                "Job Name": "extracted job title",
+                "Company": "extracted company name",
+                "Status": "one of the allowed status values"
+            }
+        ]
+    }
+    
+    EMAILS:
+    ''' + emails,
+    }]
+
+def chat_json(model, messages, format, session=None, stream_stats=None, items=1):
+    """
+    Send one chat request and return the reply text.
+
+    Args:
+        model: Ollama model name
+        messages: Chat messages
+        format: JSON schema constraining the reply
+        session: Optional ModelSession supplying request options
+        stream_stats: Optional StreamStats; when given the reply is streamed
+            and generation is cancelled once the JSON object closes
+        items: Number of emails the reply covers
+
+    Returns:
+        Tuple of (reply text, response_metadata() dictionary)
+    """
+    start = time.perf_counter()
+    session_kwargs = session.request_kwargs(items) if session else {}
+    if stream_stats is not None:
+        num_predict = session_kwargs['options']['num_predict'] if session else DEFAULT_NUM_PREDICT * items
+        stream = ollama.chat(model=model, messages=messages, format=format, stream=True, **session_kwargs)
+        content, response = read_first_object(stream, stream_stats, num_predict)
+    else:
+        response = ollama.chat(model=model, messages=messages, format=format, **session_kwargs)
+        content = response['message']['content']
+    if session:
+        session.record(response, messages)
+    return content, response_metadata(response, time.perf_counter() - start)
+
+def getOllamaResponse(email, model, session=None, stream_stats=None):
+    return chat_json(model, build_prompt_messages(email), CLASSIFICATION_SCHEMA,
+                     session=session, stream_stats=stream_stats)
+
+def classify_in_batches(prompts, model, classifier=None, max_tokens=0, session=None, stream_stats=None):
+    """
+    Classify several emails per request to share the instruction block.
+
+    Args:
+        prompts: Dictionary mapping email ID to that email's prompt text
+        model: Ollama model name
+        classifier: Optional ConcurrentClassifier to send batches concurrently
+        max_tokens: Token budget for the emails packed into one request
+        session: Optional ModelSession supplying request options
+        stream_stats: Optional StreamStats to stream replies and stop early
+
+    Returns:
+        Tuple of (dictionary mapping email ID to its validated classification,
+        dictionary mapping every batched email ID to (response_metadata() of
+        its request or None when it failed, emails in that request)). IDs
+        whose result was missing or invalid, and emails that did not fit in a
+        batch with others, are absent from the first and should be classified
+        one at a time.
+    """
+    ids = list(prompts)
+    groups = [[ids[i] for i in group] for group in pack_batches(list(prompts.values()), max_tokens)
+              if len(group) > 1]
+    requests = [build_batch_prompt_messages({email_id: prompts[email_id] for email_id in group}) for group in groups]
+    if classifier:
+        replies = classifier.classify(requests, format=BATCH_SCHEMA, items=max(map(len, groups), default=1))
+    else:
+        replies = []
+        for group, messages in zip(groups, requests):
+            try:
+                replies.append(chat_json(model, messages, BATCH_SCHEMA, session=session,
+                                         stream_stats=stream_stats, items=len(group)))
+            except Exception as e:
+                print(f"Ollama request failed: {e}")
+                replies.append((None, None))
+
+    results = {}
+    request_metadata = {}
+    for group, (reply, metadata) in zip(groups, replies):
+        parsed = parse_batch(reply) if reply is not None else {}
+        # Ignore IDs the model invented or copied from another batch
+        results.update({email_id: parsed[email_id] for email_id in group if email_id in parsed})
+        request_metadata.update({email_id: (metadata, len(group)) for email_id in group})
+    if classifier:
+        # classify() counted requests; count the emails the batches answered instead
+        classifier.completed += len(results) - len(groups)
+    if groups:
+        print(f"Batched {sum(len(group) for group in groups)} emails into {len(groups)} requests; "
+              f"{len(results)} answered")
+    return results, request_metadata
+
+def query_model(emails, pending, prompts, tier, batch_tokens=0, stream_stats=None, metrics=None):
+    """
+    Classify emails with one model, batching them when batch_tokens is set.
+
+    Args:
+        emails: Email dictionaries whose body is already reduced
+        pending: Indices into emails to classify
+        prompts: Dictionary mapping those indices to prompt text
+        tier: ModelTier whose model, classifier and session to use
+        batch_tokens: Token budget for batched requests; 0 disables batching
+        stream_stats: Optional StreamStats to stream replies and stop early
+        metrics: Optional InferenceMetrics recording every request per email
+
+    Returns:
+        Dictionary mapping each pending index to (classification dict or
+        None, raw model reply or None)
+    """
+    start = time.perf_counter()
+    results = {}
+    if batch_tokens and len(pending) > 1:
+        batch_results, request_metadata = classify_in_batches(
+            {emails[i]['id']: prompts[i] for i in pending}, tier.model, classifier=tier.classifier,
+            max_tokens=batch_tokens, session=tier.session, stream_stats=stream_stats)
+        results = {i: (batch_results[emails[i]['id']], json.dumps(batch_results[emails[i]['id']]))
+                   for i in pending if emails[i]['id'] in batch_results}
+        if metrics:
+            for i in pending:
+                if emails[i]['id'] in request_metadata:
+                    metadata, request_emails = request_metadata[emails[i]['id']]
+                    outcome = 'valid' if i in results else 'missing' if metadata else 'failed'
+                    metrics.record(emails[i], tier.model, metadata, outcome, request_emails)
+    # Whatever the batches did not answer falls back to one request per email
+    single = [i for i in pending if i not in results]
+    
+    if tier.classifier:
+        replies = tier.classifier.classify([build_prompt_messages(prompts[i]) for i in single])
+        if single:
+            print(f"Classified {tier.classifier.completed} emails with {tier.model} at "
+                  f"{tier.classifier.emails_per_second:.2f} emails/second")
+    else:
+        replies = [getOllamaResponse(prompts[i], tier.model, session=tier.session, stream_stats=stream_stats)
+                   for i in single]
+    
+    for i, (reply, metadata) in zip(single, replies):
+        results[i] = (getJSON(reply) if reply is not None else None, reply)
+        if metrics:
+            outcome = 'failed' if reply is None else 'valid' if results[i][0] is not None else 'invalid'
+            metrics.record(emails[i], tier.model, metadata, outcome)
+    tier.record(len(pending), time.perf_counter() - start)
+    return results
+
+def classify_pending(emails, pending, tiers, outcomes, keys=None, cache=None, batch_tokens=0, stream_stats=None,
+                     companies=None, metrics=None):
+    """
+    Send emails through the model tiers and store each final answer in
+    outcomes.
+
+    Args:
+        emails: Email dictionaries whose body is already reduced
+        pending: Indices into emails to classify
+        tiers: ModelTier list, cheapest model first
+        outcomes: List of (classification dict or None, raw model reply or
+            None) per email, updated in place
+        keys: Cache key per model and email, required with cache
+        cache: Optional ResultCache that accepted answers are written to
+    """
+    prompts = {i: str({k: emails[i][k] for k in ['subject', 'body']}) for i in pending}
+    
+    # A cheaper tier's valid answer, kept in case the larger model fails to answer at all
+    escalated_answers = {}
+    for position, tier in enumerate(tiers):
+        if not pending:
+            break
+        results = query_model(emails, pending, prompts, tier, batch_tokens=batch_tokens, stream_stats=stream_stats,
+                              metrics=metrics)
+        last = position == len(tiers) - 1
+        escalate = []
+        for i in pending:
+            current, reply = results[i]
+            reason = None if last else escalation_reason(current, companies)
+            if reason:
+                tier.escalations[reason] += 1
+                escalate.append(i)
+                if current is not None:
+                    escalated_answers[i] = (current, reply)
+                continue
+            if current is None and i in escalated_answers:
+                outcomes[i] = escalated_answers[i]
+                continue
+            if cache and current is not None:
+                cache.put(keys[tier.model][i], tier.model, PROMPT_VERSION, current)
+            outcomes[i] = (current, reply)
+        pending = escalate
+
+def classify_emails(emails, tiers, cache=None, rules=None, batch_tokens=0, stream_stats=None, companies=None,
+                    metrics=None, near_dups=None):
+    """
+    Classify a batch of prepared emails, answering templated emails by rule,
+    reusing cached results and projecting results onto near-duplicates.
+
+    With more than one tier, the cheaper models answer first and an email
+    moves on to the next model only when escalation_reason() rejects the
+    answer.
+
+    Args:
+        emails: Email dictionaries whose body is already reduced
+        tiers: ModelTier list, cheapest model first
+        cache: Optional ResultCache
+        rules: Optional RuleClassifier tried before the cache and the models
+        batch_tokens: Pack several emails into one request up to this many
+            tokens; 0 sends one request per email
+        stream_stats: Optional StreamStats to stream replies and stop early
+        companies: CompanyIndex of the sheet, for the cascade's escalation check
+        metrics: Optional InferenceMetrics recording every request per email
+        near_dups: Optional NearDuplicateIndex shared across the run
+
+    Returns:
+        List of (classification dict or None, raw model reply or None) in
+        the same order as emails
+    """
+    outcomes = [(None, None)] * len(emails)
+    if rules:
+        outcomes = [(rules.classify(email), None) for email in emails]
+    by_rule = {i for i, (current, _) in enumerate(outcomes) if current is not None}
+    keys = None
+    if cache:
+        keys = {tier.model: [cache_key(email['subject'], email['body'], tier.model, PROMPT_VERSION) for email in emails]
+                for tier in tiers}
+        # Only accepted answers are cached, so any tier's entry is final; prefer the larger model's
+        outcomes = [(current, None) if current is not None else
+                    (cache.get_first([keys[tier.model][i] for tier in reversed(tiers)]), None)
+                    for i, (current, _) in enumerate(outcomes)]
+    # Near-duplicates of an email classified earlier in the run, or of one
+    # classified in this batch, wait for that representative's result
+    members = {}
+    signatures = {}
+    if near_dups:
+        for i, (current, _) in enumerate(outcomes):
+            if i in by_rule:
+                continue
+            signatures[i] = minhash(emails[i]['body'])
+            representative = near_dups.find(signatures[i])
+            if representative is None:
+                near_dups.add(emails[i]['id'], signatures[i])
+            elif current is None and extract_company(emails[i]):
+                members[i] = representative
+    pending = [i for i, (current, _) in enumerate(outcomes) if current is None and i not in members]
+    classify_pending(emails, pending, tiers, outcomes, keys, cache, batch_tokens, stream_stats, companies, metrics)
+    
+    if near_dups:
+        for i, (current, _) in enumerate(outcomes):
+            if i in members or emails[i]['id'] not in near_dups.signatures:
+                continue
+            if current is not None:
+                near_dups.results.setdefault(emails[i]['id'], current)
+            elif emails[i]['id'] not in near_dups.results:
+                # A failed representative must not hold back later near-duplicates
+                near_dups.remove(emails[i]['id'])
+        orphans = [i for i, representative in members.items() if representative not in near_dups.results]
+        for i, representative in members.items():
+            if representative in near_dups.results:
+                outcomes[i] = (project(near_dups.results[representative], emails[i]), None)
+                near_dups.projected += 1
+        # Members of a failed representative are classified themselves, and
+        # the first one answered represents the cluster from then on
+        classify_pending(emails, orphans, tiers, outcomes, keys, cache, batch_tokens, stream_stats, companies, metrics)
+        for i in orphans:
+            current = outcomes[i][0]
+            if current is not None and near_dups.find(signatures[i]) is None:
+                near_dups.add(emails[i]['id'], signatures[i])
+                near_dups.results[emails[i]['id']] = current
+    return outcomes
+
+def batched(iterable, size):
+    """Yield lists of up to size items from any iterable, including generators."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
 
 def saveSheet(sh):
-    values = sh.get_all_values()
-    records = sh.get_all_records()
+    values = retry.call(sh.get_all_values, 'sheets.get_all_values')
+    records = retry.call(sh.get_all_records, 'sheets.get_all_records')
     if not records:
         df = pd.DataFrame(columns=['Status','Company','Date Applied','Last Updated', 'Link','Role','Company ID', 'Job ID'])
     else:
@@ -332,65 +806,21 @@ def saveSheet(sh):
     return df
 
 def getJSON(response_message):
-    # First, try to parse the entire response as JSON directly
-    try:
-        import json
-        data = json.loads(response_message.strip())
-        return data
-    except json.JSONDecodeError:
-        pass
-    
-    # If that fails, look for JSON in code blocks
-    match = re.search(r"```(?:json)?(.*?)```", response_message, re.DOTALL)
-    if match:
-        json_str = match.group(1).strip()
-        try:
-            import json
-            data = json.loads(json_str)
-            return data
-        except json.JSONDecodeError:
-            pass
-    
-    # If both methods fail, try to find a JSON-like structure
-    match = re.search(r"\{[\s\S]*?\}", response_message, re.DOTALL)
-    if match:
-        json_str = match.group(0)
-        try:
-            import json
-            data = json.loads(json_str)
-            return data
-        except json.JSONDecodeError:
-            pass
-    
-    # Last resort: regex extraction for key-value pairs
-    extracted_data = {}
-    
-    # Modified regex patterns to handle empty values
-    job_name_match = re.search(r'"Job Name"\s*:\s*"([^"]*)"', response_message)
-    company_match = re.search(r'"Company"\s*:\s*"([^"]*)"', response_message)
-    status_match = re.search(r'"Status"\s*:\s*"([^"]*)"', response_message)
-    
-    if job_name_match:
-        extracted_data["Job Name"] = job_name_match.group(1)
-    if company_match:
-        extracted_data["Company"] = company_match.group(1)
-    if status_match:
-        extracted_data["Status"] = status_match.group(1)
-    
-    if extracted_data and "Company" in extracted_data and "Status" in extracted_data:
-        # Ensure Job Name exists even if empty
-        if "Job Name" not in extracted_data:
-            extracted_data["Job Name"] = ""
-        return extracted_data
-    
-    print("Could not extract data from response:")
-    print(response_message)
-    return None
+    """
+    Validate the model's structured reply. getOllamaResponse constrains
+    generation to CLASSIFICATION_SCHEMA, so a reply is either a valid
+    object or unusable; there is no text to dig JSON out of.
+    """
+    data = parse_classification(response_message)
+    if data is None:
+        print("Could not extract data from response:")
+        print(response_message)
+    return data
 
 
 def get_label_id(service, label_name):
     """Get the ID of a label, creating it if necessary."""
-    labels = service.users().labels().list(userId='me').execute().get('labels', [])
+    labels = retry.execute(service.users().labels().list(userId='me'), 'gmail.labels.list').get('labels', [])
     for label in labels:
         if label['name'].lower() == label_name.lower():
             return label['id']
@@ -401,7 +831,7 @@ def get_label_id(service, label_name):
         'labelListVisibility': 'labelShow',
         'messageListVisibility': 'show'
     }
-    created_label = service.users().labels().create(userId='me', body=label).execute()
+    created_label = retry.execute(service.users().labels().create(userId='me', body=label), 'gmail.labels.create')
     return created_label['id']
 
 def add_label_to_emails(service, email_ids, label_id):
@@ -411,14 +841,20 @@ def add_label_to_emails(service, email_ids, label_id):
         'addLabelIds': [label_id],
         'removeLabelIds': []
     }
-    service.users().messages().batchModify(userId='me', body=body).execute()
+    retry.execute(service.users().messages().batchModify(userId='me', body=body), 'gmail.messages.batchModify')
 
-def updateSpreadsheet(worksheet, data):
-    worksheet.batch_clear(['A2:H'])
-    data = data.fillna('')
-    data = data.map(lambda x: '' if pd.isna(x) else x)
-    lists = data.values.tolist()
-    worksheet.update(range_name='A2', values=lists)
+def updateSpreadsheet(worksheet, data, synced):
+    """
+    Write only what changed since the sheet held synced, in one request.
+    
+    Args:
+        worksheet: Applications worksheet
+        data: DataFrame to write
+        synced: DataFrame as read from the worksheet at the start of the run
+    """
+    written = sync_sheet(worksheet, synced, data)
+    print(f"Sheet sync: wrote {written['cells']} cells in {written['ranges']} ranges "
+          f"({written['appended']} rows added, {written['cleared']} rows cleared)")
 
 def log_parse_failure(email_data, ai_response):
     """
@@ -447,72 +883,259 @@ def main():
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
     gmail_service = build('gmail', 'v1', credentials=creds)
+    retry.set_concurrency(_CONFIG.get('api_concurrency', 8))
+
+    body_budget = token_budget(_CONFIG, model)
+    # batch_prompt_tokens > 0 packs several short emails into each request
+    batch_tokens = _CONFIG.get('batch_prompt_tokens', 0)
+    # With small_model set, it answers first and model_version only sees the emails it is unsure about
+    small_model = _CONFIG.get('small_model')
+    tier_models = [small_model, model] if small_model and small_model != model else [model]
+    sessions = {}
+    if _CONFIG.get('model_session', True):
+        # Largest prompt the body budget allows, until earlier runs give real prompt sizes
+        instructions = build_batch_prompt_messages({}) if batch_tokens else build_prompt_messages('')
+        fallback_tokens = estimate_tokens(''.join(m['content'] for m in instructions)) + max(body_budget, batch_tokens)
+        for tier_model in tier_models:
+            sessions[tier_model] = ModelSession(tier_model, fallback_tokens, num_predict=_CONFIG.get('num_predict', 128),
+                                                keep_alive=_CONFIG.get('ollama_keep_alive', '30m'))
+            # Load the model while Gmail is being fetched
+            sessions[tier_model].warm_up()
 
-    emails = get_emails_with_label(gmail_service, include_label='Internships', exclude_label='processed')
+    sync = None
+    if _CONFIG.get('incremental_sync', False):
+        sync = IncrementalSync(gmail_service, 'Internships', 'processed')
+
+    store = None
+    if _CONFIG.get('message_store', True):
+        store = MessageStore(max_bytes=_CONFIG.get('message_store_max_mb', 256) * 1024 * 1024,
+                             parser_version=PARSER_VERSION)
+
+    # Resolve the label before fetching starts; the streaming fetch runs on
+    # its own thread and the Gmail service object is not thread-safe
+    processed_label_id = get_label_id(gmail_service, 'processed')
+    batch_size = _CONFIG.get('fetch_batch_size', 50)
+    # One masked format=full request per message; metadata_first is the option's old name
+    masked = _CONFIG.get('masked_fetch', _CONFIG.get('metadata_first', True))
+    pool = None
+    if _CONFIG.get('fetch_workers', 1) > 1:
+        pool = FetchPool(creds, workers=_CONFIG['fetch_workers'])
+    collapse = _CONFIG.get('collapse_threads', True)
+
+    if _CONFIG.get('stream_emails', False):
+        emails = prefetch(iter_emails_with_label(gmail_service, include_label='Internships', exclude_label='processed',
+                                                 batch_size=batch_size, sync=sync, store=store,
+                                                 masked=masked, pool=pool, collapse=collapse),
+                          max_buffered=2 * (batch_size or 1))
+        first_email = next(emails, None)
+        emails = itertools.chain([first_email], emails) if first_email else None
+    else:
+        emails = get_emails_with_label(gmail_service, include_label='Internships', exclude_label='processed',
+                                       batch_size=batch_size, sync=sync, store=store,
+                                       masked=masked, pool=pool, collapse=collapse)
     if not emails:
+        if sync:
+            sync.commit([])
+        if pool:
+            pool.shutdown()
+        for session in sessions.values():
+            session.wait_until_ready()
+            session.close()
         return None
 
     gc = gspread.authorize(creds)
-    spreadsheet = gc.open_by_key(SHEET_ID)
-    sh = spreadsheet.worksheet("Applications")
+    spreadsheet = retry.call(lambda: gc.open_by_key(SHEET_ID), 'sheets.open_by_key')
+    sh = retry.call(lambda: spreadsheet.worksheet("Applications"), 'sheets.worksheet')
 
     df = saveSheet(sh)
+    # What the sheet holds now; only differences from it are written back
+    synced = df.copy()
+    # Built once and extended as rows are added; replaces a difflib scan per email
+    companies = CompanyIndex(df['Company'])
+    aliases = None
+    if _CONFIG.get('company_aliases', True):
+        try:
+            aliases = AliasTable(retry.call(lambda: spreadsheet.worksheet("Backend"), 'sheets.worksheet'))
+            index_company_ids(df, aliases)
+        except gspread.exceptions.WorksheetNotFound:
+            print("No Backend sheet; company aliases are disabled")
+    for column in ('Company ID', 'Job ID'):
+        if column not in df.columns:
+            df[column] = ''
+    applications = ApplicationIndex.from_frame(df)
+    # New rows and cell changes are applied to df in one step after the loop
+    records = RecordBuffer(df)
     
-    # Get the label ID for 'processed' to mark emails after processing
-    processed_label_id = get_label_id(gmail_service, 'processed')
     emails_to_label = []  # To keep track of emails we've processed
     faulty_emails = []  # To keep track of faulty emails
+    prompt_tokens_saved = 0
     
-    for email in emails:
-        email['body'] = remove_long_links(email['body'])
-        entry = {'Status':'','Company':'','Date Applied':'','Last Applied':'','Link':'','Role':'','Last Updated':''}
-        ollamaResponse = getOllamaResponse(str({k: email[k] for k in ['subject', 'body']}),model)
-        current = getJSON(ollamaResponse)
-        # log_parse_failure(email, ollamaResponse)
+    # stream_responses stops each generation as soon as its JSON object is complete
+    stream_stats = StreamStats() if _CONFIG.get('stream_responses', False) else None
+    # With ollama_parallel > 1 emails are classified in windows of concurrent requests
+    parallel = _CONFIG.get('ollama_parallel', 1)
+    tiers = []
+    for tier_model in tier_models:
+        classifier = None
+        if parallel > 1:
+            classifier = ConcurrentClassifier(tier_model, max_in_flight=parallel, format=CLASSIFICATION_SCHEMA,
+                                              session=sessions.get(tier_model), stream_stats=stream_stats)
+        tiers.append(ModelTier(tier_model, classifier=classifier, session=sessions.get(tier_model)))
+    window = parallel * 4 if parallel > 1 else 1
+    if batch_tokens:
+        window = max(window, DEFAULT_MAX_EMAILS * parallel)
+    cache = None
+    if _CONFIG.get('result_cache', True):
+        cache = ResultCache(max_entries=_CONFIG.get('result_cache_max_entries', 50000))
+    rules = RuleClassifier() if _CONFIG.get('rule_fast_path', True) else None
+    metrics = InferenceMetrics() if _CONFIG.get('inference_metrics', True) else None
+    near_dups = None
+    if _CONFIG.get('near_duplicates', True):
+        near_dups = NearDuplicateIndex(threshold=_CONFIG.get('near_duplicate_threshold', 0.8))
+    for session in sessions.values():
+        session.wait_until_ready()
+    
+    for email_batch in batched(emails, window):
+        for email in email_batch:
+            email['body'] = remove_long_links(email['body'])
+            email['body'], reduction = reduce_body(email['body'], body_budget)
+            prompt_tokens_saved += reduction['tokens_saved']
+            logging.info(f"Body reduction for {email['id']}: saved {reduction['tokens_saved']} of "
+                         f"{reduction['tokens_before']} tokens (removed: {', '.join(reduction['removed']) or 'nothing'})")
         
-        if current is None:
-            print(f"Failed to extract JSON from response for email with subject: {email.get('subject', 'Unknown subject')}")
-            log_parse_failure(email, ollamaResponse)
-            faulty_emails.append(email['id'])
-            continue  # Skip to the next email
+        outcomes = classify_emails(email_batch, tiers, cache=cache, rules=rules, batch_tokens=batch_tokens,
+                                   stream_stats=stream_stats, companies=companies,
+                                   metrics=metrics, near_dups=near_dups)
         
-        # Only proceed if we have a valid response
-        try:
-            matches = difflib.get_close_matches(current['Company'], df['Company'], n=1, cutoff=0.8)
-            if not matches:
-                entry.update({
-                    'Status': current['Status'],
-                    'Company': current['Company'],
-                    'Role': current['Job Name'],
-                    'Last Updated': email['date'],
-                    'Date Applied': email['date']
-                })
-                df.loc[len(df)] = entry
-            else:
-                match_index = df[df['Company'] == matches[0]].index[0]
-                df.at[match_index, 'Status'] = current['Status']
-                df.at[match_index, 'Role'] = current['Job Name']
-                df.at[match_index, 'Last Updated'] = email['date']
+        for email, (current, ollamaResponse) in zip(email_batch, outcomes):
+            entry = {'Status':'','Company':'','Date Applied':'','Last Applied':'','Link':'','Role':'','Last Updated':''}
+            # log_parse_failure(email, ollamaResponse)
+            
+            if current is None:
+                print(f"Failed to extract JSON from response for email with subject: {email.get('subject', 'Unknown subject')}")
+                log_parse_failure(email, ollamaResponse)
+                faulty_emails.append(email['id'])
+                continue  # Skip to the next email
+            
+            # Only proceed if we have a valid response
+            try:
+                # An alias of the name or sender domain is an exact hit; fuzzy matching is the fallback
+                company_id = aliases.lookup(current['Company'], email.get('sender', '')) if aliases else None
+                # Whether the email was matched to a company the sheet already has
+                confirmed = company_id in applications.companies
+                if not confirmed:
+                    company_index = companies.match(current['Company'])
+                    confirmed = company_index is not None
+                    if confirmed:
+                        company_id = company_key(records.get(company_index, 'Company ID'), records.get(company_index, 'Company'))
+                    elif aliases:
+                        company_id = company_id or aliases.new_id()
+                    else:
+                        company_id = company_key('', current['Company'])
+                
+                # Each (company, role or Job ID) is its own application
+                job_id = extract_job_id(f"{email.get('subject', '')} {email.get('body', '')}")
+                match_index = applications.find(company_id, current['Job Name'], job_id)
+                if match_index is None:
+                    entry.update({
+                        'Status': current['Status'],
+                        'Company': current['Company'],
+                        'Role': current['Job Name'],
+                        'Last Updated': email['date'],
+                        'Date Applied': email['date'],
+                        'Company ID': company_id if aliases else '',
+                        'Job ID': job_id
+                    })
+                    match_index = records.append(entry)
+                    companies.add(current['Company'], match_index)
+                    applications.add(match_index, company_id, current['Job Name'], job_id)
+                else:
+                    records.set(match_index, 'Status', current['Status'])
+                    records.set(match_index, 'Last Updated', email['date'])
+                    if current['Job Name']:
+                        records.set(match_index, 'Role', current['Job Name'])
+                    if job_id:
+                        records.set(match_index, 'Job ID', job_id)
+                    applications.update(match_index, records.get(match_index, 'Role'), records.get(match_index, 'Job ID'))
+                
+                if aliases:
+                    # Only model-extracted names confirmed against an existing company become
+                    # permanent aliases; rule, cache and near-duplicate answers carry no reply
+                    if confirmed and ollamaResponse is not None:
+                        aliases.learn(current['Company'], email.get('sender', ''), company_id)
+                    else:
+                        aliases.remember(current['Company'], company_id)
             
-            # Mark this email for labeling as processed
-            emails_to_label.append(email['id'])
+                # Mark this email, and the older emails of its thread, for labeling as processed
+                emails_to_label.extend(email.get('thread_message_ids', [email['id']]))
             
-        except KeyError as e:
-            print(f"Missing key in extracted data: {e} for email with subject: {email.get('subject', 'Unknown subject')}")
-            print(f"Extracted data: {current}")
-            faulty_emails.append(email['id'])
-        except Exception as e:
-            print(f"Unexpected error processing email: {e}")
-            # May want to not mark as processed so it can be retried
+            except KeyError as e:
+                print(f"Missing key in extracted data: {e} for email with subject: {email.get('subject', 'Unknown subject')}")
+                print(f"Extracted data: {current}")
+                faulty_emails.append(email['id'])
+            except Exception as e:
+                print(f"Unexpected error processing email: {e}")
+                # May want to not mark as processed so it can be retried
+    
+    df = records.flush()
+    if pool:
+        pool.shutdown()
+    print(f"Body reduction saved about {prompt_tokens_saved} prompt tokens")
+    if rules:
+        print(f"Rule fast path: {rules.hits}/{rules.seen} emails ({rules.hit_rate:.0%}) classified without the model")
+    if near_dups:
+        print(f"Near-duplicates: {near_dups.projected} emails took the status of an earlier near-identical email")
+    if cache:
+        print(f"Classification cache: {cache.hits} hits, {cache.misses} misses")
+        cache.evict()
+    if stream_stats and stream_stats.requests:
+        print(f"Streaming stopped {stream_stats.cut_off}/{stream_stats.requests} replies once their JSON closed, "
+              f"saving up to {stream_stats.tokens_saved} generated tokens "
+              f"({stream_stats.tokens_generated} generated)")
+    if metrics:
+        summary = metrics.summary()
+        metrics.close()
+        logging.info(f"Inference metrics: {json.dumps(summary)}")
+        if summary['emails']:
+            print(f"Inference: p50 {summary['p50_latency_ms']:.0f} ms, p95 {summary['p95_latency_ms']:.0f} ms per email, "
+                  f"{summary['tokens_per_second']:.1f} tokens/s, "
+                  f"{summary['prompt_tokens_per_email']:.0f} prompt tokens per email ({metrics.path})")
+    if len(tiers) > 1:
+        for line in tier_report(tiers):
+            print(f"Cascade tier {line}")
+        logging.info(f"Cascade tiers: {json.dumps([tier.stats() for tier in tiers])}")
+    for tier_model, session in sessions.items():
+        timings = session.summary()
+        logging.info(f"Model session: {json.dumps(timings)}")
+        load = f"loaded in {timings['load_seconds']:.1f}s, " if timings['load_seconds'] is not None else ''
+        # Streamed replies cut off early carry no timings, so only completed calls are averaged
+        averages = (f", prompt eval {timings['mean_prompt_eval_ms']:.0f} ms and generation "
+                    f"{timings['mean_eval_ms']:.0f} ms per call over {timings['calls']} timed calls"
+                    if timings['calls'] else '')
+        print(f"Model {tier_model}: {load}num_ctx {timings['num_ctx']}{averages}")
+        session.close()
+    
+    if aliases:
+        learned = aliases.flush()
+        print(f"Company aliases: {aliases.hits} exact hits, {learned} new aliases saved")
     
     # Update the spreadsheet with the modified dataframe
     df.to_csv('config/data.csv', index=False)
-    updateSpreadsheet(sh, df)
+    updateSpreadsheet(sh, df, synced)
     
     # Mark all successfully processed emails
     if emails_to_label:
         add_label_to_emails(gmail_service, emails_to_label, processed_label_id)
         print(f"Marked {len(emails_to_label)} emails as processed")
+    
+    if sync:
+        sync.commit(emails_to_label)
+    
+    api_stats = retry.retry_stats()
+    logging.info(f"API calls and retries per endpoint: {json.dumps(api_stats)}")
+    retried = {endpoint: counts['retries'] for endpoint, counts in api_stats.items() if counts['retries']}
+    if retried:
+        print(f"API retries per endpoint: {retried}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,154 @@
+import difflib, re
+from utils import retry
+from utils.rules import employer_domain
+
+# Legal-form words that do not distinguish one company from another
+COMPANY_SUFFIXES = {'inc', 'incorporated', 'llc', 'ltd', 'limited', 'corp', 'corporation', 'co', 'company',
+                    'plc', 'gmbh', 'ag', 'sa', 'bv', 'lp', 'llp', 'pty', 'pvt', 'the'}
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+ID_PREFIX = 'C'
+
+
+def normalize_company(name):
+    """
+    Key for exact company lookups: lowercase, '&' as 'and', no punctuation
+    and no legal-form words, so 'Acme, Inc.' and 'ACME' share a key.
+    """
+    if not isinstance(name, str):
+        name = str(name)
+    words = _PUNCTUATION_RE.sub(' ', name.lower().replace('&', ' and ')).split()
+    kept = [word for word in words if word not in COMPANY_SUFFIXES]
+    return ' '.join(kept or words)
+
+
+class AliasTable:
+    """
+    Company aliases kept in the Backend worksheet (Company, Company ID, Role).
+
+    Each row maps an alias to a stable Company ID such as C0007. An alias is
+    either a normalize_company() key or an employer sender domain; domains
+    keep their dots and normalized names never have any, so the two cannot
+    collide. The table is read once per run into a dictionary. Aliases
+    learned from confirmed matches are appended with a single call in
+    flush(); remember() only adds to this run's dictionary.
+
+    Args:
+        worksheet: Backend worksheet
+        cutoff: Similarity a name needs to one of a Company ID's names
+            before that ID's sender domain is trusted for it
+    """
+
+    def __init__(self, worksheet, cutoff=0.8):
+        self.worksheet = worksheet
+        self.cutoff = cutoff
+        self.ids = {}
+        self.names = {}
+        self.pending = []
+        self.last_number = 0
+        self.hits = 0
+        values = retry.call(worksheet.get_all_values, 'sheets.get_all_values')
+        for row in values[1:]:
+            if len(row) >= 2 and row[0] and row[1]:
+                self._add(row[0], row[1])
+                self._track(row[1])
+
+    def _add(self, alias, company_id):
+        """Map alias to company_id unless it is already mapped. Returns whether it was added."""
+        if not alias or alias in self.ids:
+            return False
+        self.ids[alias] = company_id
+        if '.' not in alias:
+            self.names.setdefault(company_id, set()).add(alias)
+        return True
+
+    def _track(self, company_id):
+        if company_id.startswith(ID_PREFIX) and company_id[len(ID_PREFIX):].isdigit():
+            self.last_number = max(self.last_number, int(company_id[len(ID_PREFIX):]))
+
+    def lookup(self, company, sender=''):
+        """
+        Company ID for a company name or, failing that, the sender's domain.
+
+        Returns:
+            Company ID, or None when neither alias is known
+        """
+        key = normalize_company(company) if company else ''
+        company_id = self.ids.get(key) if key else None
+        if company_id is None:
+            domain = employer_domain(sender)
+            candidate = self.ids.get(domain) if domain else None
+            # Recruiting agencies and unlisted ATS hosts send for many companies, so a
+            # domain only decides when the name is missing or close to one of the ID's names
+            if candidate is not None and (not key or self.agrees(key, candidate)):
+                company_id = candidate
+        if company_id is not None:
+            self.hits += 1
+        return company_id
+
+    def new_id(self):
+        self.last_number += 1
+        return f'{ID_PREFIX}{self.last_number:04d}'
+
+    def agrees(self, key, company_id):
+        """Whether a normalized name is close to any name known for company_id."""
+        return any(difflib.SequenceMatcher(None, key, name).ratio() >= self.cutoff
+                   for name in self.names.get(company_id, ()))
+
+    def remember(self, company, company_id):
+        """Map the company's name to company_id for this run only."""
+        self._track(company_id)
+        if company:
+            self._add(normalize_company(company), company_id)
+
+    def learn(self, company, sender, company_id):
+        """
+        Map the company's name and employer domain to company_id unless
+        already known, and queue the new aliases for the Backend sheet. Only
+        call this for a match that was confirmed against an existing company.
+        """
+        self._track(company_id)
+        for alias in (normalize_company(company) if company else '', employer_domain(sender)):
+            if self._add(alias, company_id):
+                self.pending.append([alias, company_id, ''])
+
+    def flush(self):
+        """Append the aliases learned this run. Returns how many were written."""
+        if not self.pending:
+            return 0
+        rows, self.pending = self.pending, []
+        retry.call(lambda: self.worksheet.append_rows(rows, value_input_option='RAW'), 'sheets.append_rows')
+        return len(rows)
+
+
+def index_company_ids(df, aliases):
+    """
+    Give every row a Company ID, and map every Company ID to the first row
+    that carries it.
+
+    Rows that already have an ID are read first, so new IDs continue after
+    every ID in the sheet, wherever its row is. A blank cell then takes the
+    ID of the company's alias, or a new ID. Each row's company name is
+    remembered as an alias of its ID for this run; the sheet holds it, so it
+    is not written to the Backend sheet.
+
+    Returns:
+        Dictionary of Company ID to DataFrame row label
+    """
+    if 'Company ID' not in df.columns:
+        df['Company ID'] = ''
+    rows = {}
+    blank = []
+    for row, company, company_id in zip(df.index, df['Company'], df['Company ID']):
+        if not company:
+            continue
+        if company_id and isinstance(company_id, str):
+            aliases.remember(company, company_id)
+            rows.setdefault(company_id, row)
+        else:
+            blank.append((row, company))
+    for row, company in blank:
+        company_id = aliases.ids.get(normalize_company(company)) or aliases.new_id()
+        df.at[row, 'Company ID'] = company_id
+        aliases.remember(company, company_id)
+        rows[company_id] = min(row, rows.get(company_id, row))
+    return rows
@@ -0,0 +1,108 @@
+import re
+from utils.aliases import normalize_company
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+# Spellings of the same title that should share a key
+_ROLE_WORDS = {'internship': 'intern', 'sr': 'senior', 'jr': 'junior'}
+
+
+def normalize_role(role):
+    """Key for exact role lookups: lowercase, no punctuation, 'Internship' as 'intern'."""
+    if not isinstance(role, str):
+        return ''
+    words = _PUNCTUATION_RE.sub(' ', role.lower().replace('co-op', 'coop')).split()
+    return ' '.join(_ROLE_WORDS.get(word, word) for word in words)
+
+
+def company_key(company_id, company):
+    """Company ID when there is one, otherwise the normalized company name."""
+    if isinstance(company_id, str) and company_id:
+        return company_id
+    return normalize_company(company) if company else ''
+
+
+class ApplicationIndex:
+    """
+    Exact lookup of application rows by (company, role) or (company, Job ID).
+
+    A company is keyed by its Company ID, or by its normalized name when the
+    sheet has none. Each row is indexed under its Job ID and its normalized
+    role, and every company keeps its rows in sheet order, so a company can
+    hold several applications and both lookups and inserts are dictionary
+    operations. Rows are registered with add() as main() inserts them and
+    re-keyed with update() when their role or Job ID is filled in.
+    """
+
+    def __init__(self):
+        self.keys = {}
+        self.companies = {}
+        self.row_keys = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        """Index every row of the Applications DataFrame."""
+        index = cls()
+        company_ids = df['Company ID'] if 'Company ID' in df.columns else [''] * len(df)
+        job_ids = df['Job ID'] if 'Job ID' in df.columns else [''] * len(df)
+        for row, company, company_id, role, job_id in zip(df.index, df['Company'], company_ids, df['Role'], job_ids):
+            company = company_key(company_id, company)
+            if company:
+                index.add(row, company, role, job_id)
+        return index
+
+    def _row_keys(self, company, role, job_id):
+        keys = []
+        if isinstance(job_id, (str, int)) and str(job_id):
+            keys.append((company, 'job', str(job_id).upper()))
+        role = normalize_role(role)
+        if role:
+            keys.append((company, 'role', role))
+        return keys
+
+    def add(self, row, company, role='', job_id=''):
+        """Register a row; the first row holding a key keeps it."""
+        self.companies.setdefault(company, []).append(row)
+        self.row_keys[row] = (company, self._row_keys(company, role, job_id))
+        for key in self.row_keys[row][1]:
+            self.keys.setdefault(key, row)
+
+    def update(self, row, role='', job_id=''):
+        """Re-key a row after its role or Job ID changed."""
+        company, old_keys = self.row_keys[row]
+        for key in old_keys:
+            if self.keys.get(key) == row:
+                del self.keys[key]
+        self.row_keys[row] = (company, self._row_keys(company, role, job_id))
+        for key in self.row_keys[row][1]:
+            self.keys.setdefault(key, row)
+
+    def _job_id(self, row):
+        return next((key[2] for key in self.row_keys[row][1] if key[1] == 'job'), '')
+
+    def find(self, company, role='', job_id=''):
+        """
+        Row of the application an email refers to.
+
+        The Job ID is tried first, then the role. A row found by role whose
+        Job ID differs from the email's is another requisition with the same
+        title, so the email is a new application. An email without a role or
+        Job ID falls back to the company's first row. An email with a role
+        the company has no row for reuses the company's only row when that
+        row has no role yet; otherwise it is a new application.
+
+        Returns:
+            Row label, or None when a new row should be inserted
+        """
+        keys = self._row_keys(company, role, job_id)
+        for key in keys:
+            if key in self.keys:
+                row = self.keys[key]
+                if key[1] == 'role' and keys[0][1] == 'job' and self._job_id(row) not in ('', keys[0][2]):
+                    return None
+                return row
+        rows = self.companies.get(company, [])
+        if not keys:
+            return rows[0] if rows else None
+        if len(rows) == 1 and not self.row_keys[rows[0]][1]:
+            return rows[0]
+        return None
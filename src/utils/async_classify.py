@@ -0,0 +1,80 @@
+import asyncio, time
+from ollama import AsyncClient
+from utils.json_stream import aread_first_object
+from utils.session import DEFAULT_NUM_PREDICT
+from utils.telemetry import response_metadata
+
+
+class ConcurrentClassifier:
+    """
+    Send chat requests to Ollama concurrently through ollama.AsyncClient.
+
+    The server only answers requests in parallel up to OLLAMA_NUM_PARALLEL,
+    so max_in_flight should match that setting; anything above it just
+    queues on the server.
+    """
+
+    def __init__(self, model, max_in_flight=4, host=None, format=None, session=None, stream_stats=None):
+        self.model = model
+        self.session = session
+        # When set, replies are streamed and cancelled once their JSON object closes
+        self.stream_stats = stream_stats
+        self.format = format
+        self.max_in_flight = max(1, max_in_flight)
+        self.host = host
+        self.completed = 0
+        self.elapsed = 0.0
+
+    @property
+    def emails_per_second(self):
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    async def _classify(self, requests, format, items):
+        client = AsyncClient(host=self.host)
+        limit = asyncio.Semaphore(self.max_in_flight)
+        session_kwargs = self.session.request_kwargs(items) if self.session else {}
+
+        async def chat(messages):
+            async with limit:
+                start = time.perf_counter()
+                try:
+                    if self.stream_stats is not None:
+                        num_predict = session_kwargs['options']['num_predict'] if self.session \
+                            else DEFAULT_NUM_PREDICT * items
+                        stream = await client.chat(model=self.model, messages=messages, format=format,
+                                                   stream=True, **session_kwargs)
+                        content, response = await aread_first_object(stream, self.stream_stats, num_predict)
+                    else:
+                        response = await client.chat(model=self.model, messages=messages, format=format,
+                                                     **session_kwargs)
+                        content = response['message']['content']
+                    if self.session:
+                        self.session.record(response, messages)
+                    return content, response_metadata(response, time.perf_counter() - start)
+                except Exception as e:
+                    print(f"Ollama request failed: {e}")
+                    return None, None
+
+        # gather keeps the results in input order
+        return await asyncio.gather(*(chat(messages) for messages in requests))
+
+    def classify(self, requests, format=None, items=1):
+        """
+        Run a list of chat message lists and wait for all replies.
+
+        Args:
+            requests: List of chat message lists
+            format: Output schema for these requests instead of the default
+            items: Most emails one request answers, to size the reply budget
+
+        Returns:
+            List of (reply string, response_metadata() dictionary) in input
+            order, (None, None) where a request failed
+        """
+        if not requests:
+            return []
+        start = time.perf_counter()
+        replies = asyncio.run(self._classify(requests, format or self.format, items))
+        self.elapsed += time.perf_counter() - start
+        self.completed += len(requests)
+        return replies
@@ -0,0 +1,32 @@
+from utils.body_reducer import estimate_tokens
+
+DEFAULT_MAX_EMAILS = 8
+
+
+def pack_batches(prompts, max_tokens, max_emails=DEFAULT_MAX_EMAILS):
+    """
+    Group prompts, in order, into batches whose combined size fits a token
+    budget.
+
+    A prompt that is too large to share a request on its own budget ends up
+    in a batch of one, which callers send through the single-email path.
+
+    Args:
+        prompts: List of per-email prompt strings
+        max_tokens: Token budget for the emails of one batched request
+        max_emails: Most emails packed into one request
+
+    Returns:
+        List of lists of indices into prompts
+    """
+    batches, current, used = [], [], 0
+    for i, prompt in enumerate(prompts):
+        tokens = estimate_tokens(prompt)
+        if current and (used + tokens > max_tokens or len(current) >= max_emails):
+            batches.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
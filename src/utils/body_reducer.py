@@ -0,0 +1,136 @@
+import re
+
+# Rough size of a token for English prose; good enough to budget prompts
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 1500
+# Never cut a body down below this many characters when removing a section
+MIN_KEEP_CHARS = 80
+# Characters kept after a sign-off; the name, title and company often live there
+SIGNATURE_KEEP_CHARS = 120
+# A footer is a run of footer markers at most FOOTER_GAP_CHARS apart whose last
+# marker lies in the final FOOTER_TAIL_CHARS of the body
+FOOTER_TAIL_CHARS = 400
+FOOTER_GAP_CHARS = 200
+
+# Bodies arrive whitespace-collapsed, so every marker is matched inline. Quoted
+# '>' lines cannot be told apart from prose once newlines are gone, so they are
+# not a marker; a Gmail / Apple Mail attribution line needs a capital 'On' and a
+# year, a time or an address before 'wrote:', so prose like "the manager wrote:"
+# is left alone.
+_ATTRIBUTION_DETAIL = r'(?:\b(?:19|20)\d\d\b|\b\d{1,2}:\d\d\b|[\w.+-]+@[\w-]+(?:\.[\w-]+)+)'
+REPLY_MARKERS = re.compile(
+    rf'(?-i:\bOn )[^<>]{{0,120}}?{_ATTRIBUTION_DETAIL}[^<>]{{0,120}}?(?:<[^>]{{3,80}}>)?\s?(?-i:wrote:)'  # Gmail / Apple Mail
+    r'|-{2,}\s*Original Message\s*-{2,}'                       # Outlook
+    r'|\bFrom: .{1,200}? Sent: .{1,100}? To: '                 # Outlook headers
+    r'|_{10,}',                                                # Outlook separator line
+    re.IGNORECASE)
+SIGNOFF_MARKERS = re.compile(
+    r'(?:^|\s)-- (?=\S)'
+    r'|\b(?:Best regards|Kind regards|Warm regards|Warmest regards|Regards|Best wishes|Sincerely|'
+    r'Thanks again|Thank you again|All the best|Cheers),',
+    re.IGNORECASE)
+FOOTER_MARKERS = re.compile(
+    r'\bunsubscribe\b|\bmanage (?:your )?(?:email )?preferences\b|\byou (?:are )?receiv(?:ed|ing) this\b'
+    r'|\bthis (?:e-?mail|message) was sent to\b|\bconfidentiality notice\b|\bprivacy policy\b'
+    r'|\ball rights reserved\b|©|\bview (?:this email )?in (?:your|a) browser\b'
+    r'|\bplease do not reply\b|\bis an equal (?:employment )?opportunity employer\b'
+    r'|\bthis (?:e-?mail|message) (?:and any attachments )?(?:is|are|may be) (?:confidential|intended)',
+    re.IGNORECASE)
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def token_budget(config, model):
+    """
+    Body token budget for a model from email_config.json.
+
+    body_token_budget may be a number for every model, or a dictionary keyed
+    by model name with an optional 'default' entry.
+    """
+    budget = config.get('body_token_budget', DEFAULT_TOKEN_BUDGET)
+    if isinstance(budget, dict):
+        return budget.get(model, budget.get('default', DEFAULT_TOKEN_BUDGET))
+    return budget
+
+
+def _cut_reply_chain(text):
+    for match in REPLY_MARKERS.finditer(text):
+        if match.start() >= MIN_KEEP_CHARS:
+            return text[:match.start()]
+    return text
+
+
+def _cut_footer(text):
+    # Only look in the second half so a phrase near the top cannot eat the message
+    starts = [match.start() for match in FOOTER_MARKERS.finditer(text, len(text) // 2)]
+    if not starts or starts[-1] < len(text) - FOOTER_TAIL_CHARS:
+        return text
+    start = starts[-1]
+    run = 1
+    for previous in reversed(starts[:-1]):
+        if start - previous > FOOTER_GAP_CHARS:
+            break
+        start = previous
+        run += 1
+    # A lone marker ("please review the privacy policy section and sign by Friday") is message text
+    if run >= 2 and start >= MIN_KEEP_CHARS:
+        return text[:start]
+    return text
+
+
+def _cut_signature(text):
+    # The last sign-off in the final 40% of the body starts the signature
+    last = None
+    for match in SIGNOFF_MARKERS.finditer(text, int(len(text) * 0.6)):
+        last = match
+    if last and last.start() >= MIN_KEEP_CHARS:
+        return text[:last.end() + SIGNATURE_KEEP_CHARS]
+    return text
+
+
+def _cap(text, max_tokens):
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(' ', 0, max_chars)
+    return text[:cut if cut > 0 else max_chars]
+
+
+def reduce_body(text, max_tokens=DEFAULT_TOKEN_BUDGET):
+    """
+    Shrink an email body before it goes into the prompt.
+
+    Quoted reply chains, boilerplate footers and the tail of signatures are
+    removed, then the result is capped to max_tokens (estimated at
+    CHARS_PER_TOKEN characters each) at a word boundary.
+
+    Args:
+        text: Cleaned, whitespace-collapsed email body
+        max_tokens: Token budget for the body; falsy disables the cap
+
+    Returns:
+        Tuple of (reduced body, stats dictionary with tokens_before,
+        tokens_after, tokens_saved and the list of sections removed)
+    """
+    tokens_before = estimate_tokens(text)
+    removed = []
+    for name, reducer in (('reply', _cut_reply_chain), ('footer', _cut_footer), ('signature', _cut_signature)):
+        reduced = reducer(text)
+        if len(reduced) < len(text):
+            removed.append(name)
+            text = reduced
+    if max_tokens:
+        reduced = _cap(text, max_tokens)
+        if len(reduced) < len(text):
+            removed.append('budget')
+            text = reduced
+    text = text.strip()
+    tokens_after = estimate_tokens(text)
+    return text, {
+        'tokens_before': tokens_before,
+        'tokens_after': tokens_after,
+        'tokens_saved': tokens_before - tokens_after,
+        'removed': removed
+    }
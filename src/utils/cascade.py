@@ -0,0 +1,67 @@
+from collections import Counter
+
+
+class ModelTier:
+    """
+    One model in the classification cascade, with what it needs to send
+    requests and what it handled during the run.
+
+    Args:
+        model: Ollama model name
+        classifier: Optional ConcurrentClassifier bound to this model
+        session: Optional ModelSession bound to this model
+    """
+
+    def __init__(self, model, classifier=None, session=None):
+        self.model = model
+        self.classifier = classifier
+        self.session = session
+        self.emails = 0
+        self.seconds = 0.0
+        self.escalations = Counter()
+
+    def record(self, emails, seconds):
+        self.emails += emails
+        self.seconds += seconds
+
+    @property
+    def seconds_per_email(self):
+        return self.seconds / self.emails if self.emails else 0.0
+
+    def stats(self):
+        return {'model': self.model, 'emails': self.emails, 'seconds': self.seconds,
+                'escalations': dict(self.escalations)}
+
+
+def escalation_reason(result, companies):
+    """
+    Why a cheaper tier's answer should be checked by the next model.
+
+    Args:
+        result: Validated classification, or None when the reply did not parse
+        companies: CompanyIndex of the sheet, matched the way main() matches rows
+
+    Returns:
+        'unparsed', 'draft' or 'unknown company', or None to accept the answer
+    """
+    if result is None:
+        return 'unparsed'
+    if result['Status'] == 'Draft':
+        return 'draft'
+    if companies is None or companies.match(result['Company']) is None:
+        return 'unknown company'
+    return None
+
+
+def tier_report(tiers):
+    """One line per tier: share of model traffic, latency and escalations."""
+    total = sum(tier.emails for tier in tiers[:1]) or 1
+    lines = []
+    for tier in tiers:
+        line = (f"{tier.model}: {tier.emails} emails ({tier.emails / total:.0%} of model traffic), "
+                f"{tier.seconds_per_email:.2f} s/email")
+        if tier.escalations:
+            reasons = ', '.join(f'{reason} {count}' for reason, count in tier.escalations.most_common())
+            line += f", escalated {sum(tier.escalations.values())} ({reasons})"
+        lines.append(line)
+    return lines
@@ -0,0 +1,176 @@
+import difflib
+from collections import Counter, defaultdict
+
+DEFAULT_CUTOFF = 0.8
+
+
+def _bigrams(name):
+    """Bigrams tagged with their occurrence number, so set overlap counts repeats."""
+    seen = Counter()
+    tokens = []
+    for i in range(len(name) - 1):
+        gram = name[i:i + 2]
+        seen[gram] += 1
+        tokens.append((gram, seen[gram]))
+    return frozenset(tokens)
+
+
+class CompanyIndex:
+    """
+    Fuzzy company lookup that returns exactly what
+
+        difflib.get_close_matches(name, df['Company'], n=1, cutoff=cutoff)
+
+    followed by the first row holding that match would, without running
+    SequenceMatcher against every row.
+
+    Exact names are answered from a name -> first row map. Otherwise only
+    rows that can possibly reach the cutoff are scored:
+
+    - ratio() <= real_quick_ratio() = 2 * min(la, lb) / (la + lb), so the
+      length of a candidate is bounded, as in difflib's own first check.
+    - ratio() >= cutoff needs M >= cutoff * T / 2 matching characters
+      (T = la + lb), and the matching blocks form a common subsequence of
+      length M. At most la - M gaps in one string and lb - M in the other
+      break it up, so at least 3M - T - 1 of its adjacent pairs are bigrams
+      of both strings. To share that many of the query's bigrams a name must
+      contain at least one of any len(query bigrams) - need + 1 of them, so
+      only the postings of the rarest ones are read (prefix filtering), and
+      the overlap is then checked exactly. Postings are bucketed by name
+      length. Names too short for the bound to be positive are compared
+      directly.
+
+    Survivors go through the same real_quick_ratio / quick_ratio / ratio
+    sequence as get_close_matches, and the best (score, name) pair wins, as
+    with heapq.nlargest there.
+    """
+
+    def __init__(self, names=(), cutoff=DEFAULT_CUTOFF):
+        self.cutoff = cutoff
+        self.rows = {}
+        self.by_length = defaultdict(list)
+        # (name length, occurrence-tagged bigram) -> names
+        self.postings = defaultdict(list)
+        self.bigrams = {}
+        for row, name in enumerate(names):
+            self.add(name, row)
+
+    def add(self, name, row):
+        """Index a company name stored at a DataFrame row."""
+        # get_all_records turns numeric cells into numbers; only text names can match
+        if not isinstance(name, str) or name in self.rows:
+            return
+        self.rows[name] = row
+        self.by_length[len(name)].append(name)
+        self.bigrams[name] = _bigrams(name)
+        for token in self.bigrams[name]:
+            self.postings[len(name), token].append(name)
+
+    def _candidates(self, word):
+        la = len(word)
+        lengths = [lb for lb in self.by_length
+                   if (2.0 * min(la, lb) / (la + lb) if la + lb else 1.0) >= self.cutoff]
+        candidates = []
+        needs = {}
+        for lb in lengths:
+            total = la + lb
+            need = 3 * self._min_matches(total) - total - 1 if total else 0
+            if need <= 0:
+                candidates.extend(self.by_length[lb])
+            else:
+                needs[lb] = need
+        if needs:
+            tokens = _bigrams(word)
+            for lb, need in needs.items():
+                if need > len(tokens):
+                    continue
+                rarest = sorted(tokens, key=lambda token: len(self.postings.get((lb, token), ())))
+                names = set()
+                for token in rarest[:len(tokens) - need + 1]:
+                    names.update(self.postings.get((lb, token), ()))
+                candidates.extend(name for name in names if len(tokens & self.bigrams[name]) >= need)
+        return candidates
+
+    def _min_matches(self, total):
+        """Fewest matching characters whose ratio, computed as difflib does, reaches the cutoff."""
+        matches = int(self.cutoff * total / 2)
+        while 2.0 * matches / total < self.cutoff:
+            matches += 1
+        return matches
+
+    def closest(self, word):
+        """The company name get_close_matches would return, or None."""
+        if word in self.rows:
+            # Only an identical string scores 1.0 (autojunk starts at 200 characters), so nothing beats it
+            return word
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(word)
+        best = None
+        for name in self._candidates(word):
+            matcher.set_seq1(name)
+            if (matcher.real_quick_ratio() >= self.cutoff and matcher.quick_ratio() >= self.cutoff
+                    and matcher.ratio() >= self.cutoff):
+                scored = (matcher.ratio(), name)
+                if best is None or scored > best:
+                    best = scored
+        return best[1] if best else None
+
+    def match(self, word):
+        """
+        First DataFrame row whose company is the closest match for word.
+
+        Returns:
+            Row label, or None when nothing reaches the cutoff
+        """
+        name = self.closest(word)
+        return None if name is None else self.rows[name]
+
+
+def sample_names(count, seed=3):
+    """Synthetic company names built from random syllables and common suffixes."""
+    import random
+    rng = random.Random(seed)
+    syllables = ['ac', 'me', 'glo', 'bex', 'ini', 'tech', 'um', 'brel', 'la', 'hoo', 'li', 'stark', 'way', 'ne',
+                 'won', 'ka', 'cy', 'ber', 'dyne', 'ty', 'rell', 'soy', 'lent', 'mas', 'sive', 'dy', 'na', 'mic',
+                 'blu', 'red', 'nor', 'th', 'quan', 'tum', 'ver', 'tex', 'nim', 'bus', 'a', 'pex', 'zen', 'or']
+    suffixes = ['', ' Inc', ' Labs', ' Systems', ' Technologies', ' Group', ' Corp', ' AI', ' Capital', ' Health']
+    return [''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).title() + rng.choice(suffixes)
+            for _ in range(count)]
+
+
+def benchmark(rows=10000, queries=500):
+    """Compare against difflib.get_close_matches on synthetic names and check both agree."""
+    import random, time
+    names = sample_names(rows)
+    rng = random.Random(5)
+    words = []
+    for _ in range(queries):
+        name = rng.choice(names)
+        # Exact hits, small typos and unrelated names
+        choice = rng.random()
+        if choice < 0.3:
+            words.append(name)
+        elif choice < 0.8:
+            position = rng.randrange(len(name))
+            words.append(name[:position] + rng.choice('aeiou') + name[position + 1:])
+        else:
+            words.append(sample_names(1, seed=rng.random())[0])
+
+    start = time.perf_counter()
+    index = CompanyIndex(names)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    indexed = [index.closest(word) for word in words]
+    indexed_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = [(difflib.get_close_matches(word, names, n=1, cutoff=DEFAULT_CUTOFF) or [None])[0] for word in words]
+    linear_time = time.perf_counter() - start
+
+    mismatches = sum(a != b for a, b in zip(indexed, expected))
+    print(f"{rows} rows, {queries} lookups: difflib {linear_time:.2f}s, index {indexed_time:.3f}s "
+          f"(+{built:.2f}s build), {linear_time / indexed_time:.0f}x faster, {mismatches} mismatches")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,62 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from googleapiclient.discovery import build
+from ratelimit import limits, sleep_and_retry
+
+# Gmail allows 250 quota units per user per second and messages.get costs 5
+GMAIL_QUOTA_UNITS_PER_SECOND = 250
+MESSAGES_GET_COST = 5
+
+
+class FetchPool:
+    """
+    Thread pool for Gmail requests. httplib2 is not thread-safe, so every
+    worker builds and keeps its own authorized service object. All workers
+    draw from one rate limiter sized to the per-user quota.
+    """
+
+    def __init__(self, creds, workers=4, quota_units_per_second=GMAIL_QUOTA_UNITS_PER_SECOND):
+        self.creds = creds
+        self.workers = max(1, workers)
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='gmail-fetch')
+        calls_per_second = max(1, quota_units_per_second // MESSAGES_GET_COST)
+        # One call to _acquire spends one messages.get worth of quota
+        self._acquire = sleep_and_retry(limits(calls=calls_per_second, period=1)(lambda: None))
+
+    def _service(self):
+        if not hasattr(self._local, 'service'):
+            self._local.service = build('gmail', 'v1', credentials=self.creds, cache_discovery=False)
+        return self._local.service
+
+    def _run(self, fn, item, cost):
+        for _ in range(cost(item)):
+            self._acquire()
+        return fn(self._service(), item)
+
+    def map(self, fn, items, cost=lambda item: 1):
+        """
+        Call fn(service, item) for every item on the worker threads.
+
+        Items are pulled from the iterable on the calling thread, at most two
+        per worker are in flight at once, and results come back in input order.
+
+        Args:
+            fn: Function taking the worker's Gmail service and one item
+            items: Iterable of work items
+            cost: Function returning how many messages.get calls an item makes
+
+        Yields:
+            fn's return value for each item
+        """
+        in_flight = deque()
+        for item in items:
+            in_flight.append(self._executor.submit(self._run, fn, item, cost))
+            if len(in_flight) >= 2 * self.workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
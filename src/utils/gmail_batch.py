@@ -0,0 +1,90 @@
+import time
+from utils import retry
+
+# Gmail rejects batches larger than 100 sub-requests and starts rate limiting
+# well before that, so 50 is the recommended ceiling.
+MAX_BATCH_SIZE = 100
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def fetch_messages(service, message_ids, batch_size=50, max_retries=3, **get_kwargs):
+    """
+    Fetch Gmail messages through batch HTTP requests.
+
+    Sub-requests that fail with a rate limit or server error are collected and
+    re-sent in a fresh batch after the shared retry backoff, honoring the
+    largest Retry-After among them. Any other per-item error
+    is reported and the message is left out of the result.
+
+    Args:
+        service: The Gmail API service instance
+        message_ids: Iterable of Gmail message IDs to fetch
+        batch_size: Number of sub-requests per batch (capped at 100)
+        max_retries: How many times a failed sub-request is re-sent
+        **get_kwargs: Extra arguments for messages().get (format, fields, ...)
+
+    Returns:
+        Dictionary mapping message ID to the messages().get response
+    """
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    results = {}
+    pending = list(dict.fromkeys(message_ids))
+    attempt = 0
+
+    while pending:
+        failed = []
+        errors = {}
+        retry_after = []
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                results[request_id] = response
+                return
+            retryable, wait = retry.retry_info(exception)
+            if retryable:
+                failed.append(request_id)
+                errors[request_id] = exception
+                if wait is not None and str(wait).replace('.', '', 1).isdigit():
+                    retry_after.append(float(wait))
+            else:
+                print(f"Error fetching message {request_id}: {exception}")
+
+        for chunk in _chunks(pending, batch_size):
+            batch = service.new_batch_http_request(callback=callback)
+            for message_id in chunk:
+                batch.add(service.users().messages().get(userId='me', id=message_id, **get_kwargs),
+                          request_id=message_id)
+                retry.record_call('gmail.messages.get')
+            try:
+                with retry.concurrency_slot():
+                    batch.execute()
+                retry.record_call('gmail.batch')
+            except Exception as e:
+                # The whole batch call failed; retry every item that has no answer yet
+                print(f"Batch request failed: {e}")
+                for message_id in chunk:
+                    if message_id not in results and message_id not in failed:
+                        failed.append(message_id)
+                        errors[message_id] = e
+
+        if not failed:
+            break
+
+        if attempt >= max_retries:
+            for message_id in failed:
+                print(f"Giving up on message {message_id} after {max_retries} retries: {errors[message_id]}")
+            break
+
+        for _ in failed:
+            retry.record_retry('gmail.messages.get')
+        delay = retry.backoff_delay(attempt, max(retry_after, default=None))
+        attempt += 1
+        print(f"Retrying {len(failed)} failed messages in {delay:.1f}s (attempt {attempt}/{max_retries})")
+        time.sleep(delay)
+        pending = failed
+
+    return results
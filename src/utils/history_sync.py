@@ -0,0 +1,149 @@
+import json, os
+from googleapiclient.errors import HttpError
+from utils import retry
+
+SYNC_STATE_PATH = os.path.join('config', 'sync_state.json')
+
+
+class IncrementalSync:
+    """
+    Track the Gmail historyId between runs so only new or relabeled messages
+    need to be listed.
+
+    Usage:
+        sync = IncrementalSync(service, 'Internships', 'processed')
+        messages = sync.changed_messages()   # None means run the full query
+        if messages is None:
+            sync.begin_full_sync()
+            ...
+        sync.commit(processed_ids)
+    """
+
+    def __init__(self, service, include_label, exclude_label, path=SYNC_STATE_PATH):
+        self.service = service
+        self.include_label = include_label
+        self.exclude_label = exclude_label
+        self.path = path
+        self.state = self._load_state()
+        self.listed = []
+        # Set only once a listing (history or full query) has completed
+        self._new_history_id = None
+        self._full_sync_history_id = None
+
+    def _load_state(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable sync state {self.path}: {e}")
+            return {}
+
+    def _label_ids(self):
+        labels = retry.execute(self.service.users().labels().list(userId='me'), 'gmail.labels.list').get('labels', [])
+        by_name = {label['name'].lower(): label['id'] for label in labels}
+        return by_name.get(self.include_label.lower()), by_name.get(self.exclude_label.lower())
+
+    def changed_messages(self):
+        """
+        List messages added to the include label since the stored checkpoint.
+
+        Returns:
+            List of {'id', 'threadId'} dictionaries (newest first), including
+            messages left unprocessed by the previous run, or None when there
+            is no usable checkpoint and the full query must be run instead.
+        """
+        start_history_id = self.state.get('history_id')
+        if not start_history_id:
+            return None
+
+        include_id, exclude_id = self._label_ids()
+        if include_id is None:
+            return None
+
+        # Latest known labels per message, in the order they first appeared
+        seen = {}
+        next_page_token = None
+        requests_made = 0
+        try:
+            while True:
+                results = retry.execute(self.service.users().history().list(
+                    userId='me',
+                    startHistoryId=start_history_id,
+                    labelId=include_id,
+                    historyTypes=['messageAdded', 'labelAdded', 'labelRemoved'],
+                    pageToken=next_page_token,
+                    maxResults=500
+                ), 'gmail.history.list')
+                requests_made += 1
+
+                for record in results.get('history', []):
+                    changes = record.get('messagesAdded', []) + record.get('labelsAdded', []) + record.get('labelsRemoved', [])
+                    for change in changes:
+                        message = change['message']
+                        seen[message['id']] = {
+                            'threadId': message.get('threadId'),
+                            'labelIds': message.get('labelIds', [])
+                        }
+
+                next_page_token = results.get('nextPageToken')
+                if not next_page_token:
+                    self._new_history_id = results.get('historyId', start_history_id)
+                    break
+        except HttpError as e:
+            if e.resp.status == 404:
+                print(f"History checkpoint {start_history_id} has expired, falling back to a full sync.")
+                return None
+            raise
+
+        messages = [
+            {'id': message_id, 'threadId': info['threadId']}
+            for message_id, info in seen.items()
+            if include_id in info['labelIds'] and exclude_id not in info['labelIds']
+        ]
+        # History is chronological; the full query lists newest first
+        messages.reverse()
+
+        known = {message['id'] for message in messages}
+        for message in self.state.get('pending', []):
+            if message['id'] not in known:
+                messages.append(message)
+
+        print(f"Incremental sync: {len(messages)} messages from {requests_made} history requests "
+              f"({len(self.state.get('pending', []))} pending from the last run)")
+        self.listed = messages
+        return messages
+
+    def begin_full_sync(self):
+        """
+        Read the mailbox historyId before running the full query. It only
+        becomes the checkpoint once record_listed() confirms the query
+        finished; a failed listing must not skip the existing backlog.
+        """
+        profile = retry.execute(self.service.users().getProfile(userId='me'), 'gmail.getProfile')
+        self._full_sync_history_id = profile['historyId']
+
+    def record_listed(self, messages):
+        """Remember which messages the completed full query returned."""
+        self.listed = list(messages)
+        self._new_history_id = self._full_sync_history_id
+
+    def commit(self, processed_ids):
+        """
+        Save the new checkpoint. Listed messages that were not processed are
+        kept as pending so the next incremental run retries them. Nothing is
+        saved when no listing completed.
+        """
+        if self._new_history_id is None:
+            return
+        processed = set(processed_ids)
+        pending = [
+            {'id': message['id'], 'threadId': message.get('threadId')}
+            for message in self.listed
+            if message['id'] not in processed
+        ]
+        self.state = {'history_id': str(self._new_history_id), 'pending': pending}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(self.state, f)
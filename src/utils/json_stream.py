@@ -0,0 +1,159 @@
+class JsonObjectScanner:
+    """
+    Incrementally find where the first top-level JSON object ends.
+
+    Tracks brace depth outside of strings, honouring escapes, so braces
+    inside values such as "Company": "{Acme}" do not end the object early.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.started = False
+        self.start = 0
+        self.end = None
+
+    def feed(self, chunk):
+        """
+        Add streamed text.
+
+        Returns:
+            True once the first top-level object has closed
+        """
+        offset = len(self.text)
+        self.text += chunk
+        if self.end is not None:
+            return True
+        for i, char in enumerate(chunk, offset):
+            if not self.started:
+                # Skip anything the model writes before the object
+                if char == '{':
+                    self.started = True
+                    self.start = i
+                    self.depth = 1
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '{':
+                self.depth += 1
+            elif char == '}':
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = i + 1
+                    return True
+        return False
+
+    @property
+    def object_text(self):
+        """Text of the first complete object, or everything read so far."""
+        return self.text[self.start:self.end] if self.end is not None else self.text[self.start:]
+
+
+class StreamStats:
+    """
+    How often streaming stopped generation early and roughly what it saved.
+
+    A reply only counts as cut off when the model was still generating after
+    its object closed; a reply whose done chunk followed the object finished
+    on its own.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.cut_off = 0
+        self.tokens_generated = 0
+        self.tokens_saved = 0
+
+    def add(self, chunks, cut_off, num_predict):
+        # Ollama streams about one token per chunk
+        self.requests += 1
+        self.tokens_generated += chunks
+        if cut_off:
+            self.cut_off += 1
+            # Upper bound: the model could have stopped on its own before the cap
+            self.tokens_saved += max(0, num_predict - chunks)
+
+
+class _FirstObjectReader:
+    """
+    Shared state of read_first_object and aread_first_object.
+
+    With schema-constrained output the object normally ends the reply, and
+    the next chunk is Ollama's done chunk with the timings. So once the
+    object closes one more chunk is read: a done chunk is kept, anything
+    else means the model is still generating and the stream is cut off.
+    """
+
+    def __init__(self):
+        self.scanner = JsonObjectScanner()
+        self.chunks = 0
+        self.closed = False
+        self.final = None
+        self.cut_off = False
+
+    def read(self, part):
+        """Take one streamed chunk. Returns True when reading should stop."""
+        self.chunks += 1
+        if self.closed and not part.get('done'):
+            self.cut_off = True
+            return True
+        self.closed = self.scanner.feed(part['message']['content'])
+        if part.get('done'):
+            self.final = part
+            return True
+        return False
+
+    def result(self, stats, num_predict):
+        if stats:
+            stats.add(self.chunks, self.cut_off, num_predict)
+        return self.scanner.object_text, self.final
+
+
+def read_first_object(stream, stats=None, num_predict=0):
+    """
+    Read a streamed ollama.chat reply until its first JSON object closes
+    and the chunk after it has arrived, then stop any further generation by
+    closing the stream.
+
+    Args:
+        stream: Iterator returned by ollama.chat(..., stream=True)
+        stats: Optional StreamStats to update
+        num_predict: Generation cap of the request, to estimate tokens saved
+
+    Returns:
+        Tuple of (object text, final response chunk carrying Ollama's
+        timings, or None when the model was still generating and was cut off)
+    """
+    reader = _FirstObjectReader()
+    try:
+        for part in stream:
+            if reader.read(part):
+                break
+    finally:
+        # Closing the response makes the server cancel the rest of the generation
+        close = getattr(stream, 'close', None)
+        if close:
+            close()
+    return reader.result(stats, num_predict)
+
+
+async def aread_first_object(stream, stats=None, num_predict=0):
+    """read_first_object for ollama.AsyncClient streams."""
+    reader = _FirstObjectReader()
+    try:
+        async for part in stream:
+            if reader.read(part):
+                break
+    finally:
+        close = getattr(stream, 'aclose', None)
+        if close:
+            await close()
+    return reader.result(stats, num_predict)
@@ -0,0 +1,171 @@
+import argparse, json, os, sqlite3, time
+
+MESSAGE_STORE_PATH = os.path.join('config', 'messages.db')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Fields of a parsed email that are kept in the store
+RECORD_FIELDS = ('id', 'subject', 'date', 'internal_date', 'sender', 'body')
+
+
+def payload_metadata(payload):
+    """Copy a Gmail payload without the base64 body data, keeping headers and MIME layout."""
+    meta = {
+        'mimeType': payload.get('mimeType'),
+        'headers': payload.get('headers', []),
+        'size': payload.get('body', {}).get('size', 0)
+    }
+    if 'parts' in payload:
+        meta['parts'] = [payload_metadata(part) for part in payload['parts']]
+    return meta
+
+
+class MessageStore:
+    """
+    SQLite-backed store of fetched and cleaned Gmail messages keyed by message ID.
+
+    Entries are evicted least recently used first once the stored size passes
+    max_bytes. compact() evicts and then VACUUMs the database file.
+
+    Each entry records the parser_version it was cleaned with, and entries
+    from any other version are misses, so a parser change re-parses stored
+    messages instead of serving bodies from the old pipeline. With
+    parser_version None every entry is served.
+    """
+
+    def __init__(self, path=MESSAGE_STORE_PATH, max_bytes=DEFAULT_MAX_BYTES, parser_version=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.parser_version = None if parser_version is None else str(parser_version)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # The streaming fetch may run on a worker thread; only one thread
+        # touches the store at a time
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS messages (
+                id TEXT PRIMARY KEY,
+                thread_id TEXT,
+                subject TEXT,
+                sender TEXT,
+                date TEXT,
+                internal_date INTEGER,
+                body TEXT,
+                payload_meta TEXT,
+                size INTEGER,
+                stored_at REAL,
+                last_used REAL,
+                parser_version TEXT
+            )''')
+        # Stores created before parser versions were recorded; their rows stay NULL and are re-parsed
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(messages)')}
+        if 'parser_version' not in columns:
+            self.conn.execute('ALTER TABLE messages ADD COLUMN parser_version TEXT')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_last_used ON messages (last_used)')
+        self.conn.commit()
+
+    def get_many(self, message_ids):
+        """
+        Look up stored messages parsed with this store's parser version.
+
+        Returns:
+            Dictionary mapping message ID to the parsed email dictionary
+        """
+        message_ids = list(message_ids)
+        found = {}
+        version = '' if self.parser_version is None else ' AND parser_version = ?'
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(message_ids), 500):
+            chunk = message_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            params = chunk if self.parser_version is None else chunk + [self.parser_version]
+            rows = self.conn.execute(
+                f'SELECT {", ".join(RECORD_FIELDS)} FROM messages WHERE id IN ({placeholders}){version}', params)
+            for row in rows:
+                found[row[0]] = dict(zip(RECORD_FIELDS, row))
+        if found:
+            now = time.time()
+            self.conn.executemany('UPDATE messages SET last_used = ? WHERE id = ?',
+                                  [(now, message_id) for message_id in found])
+            self.conn.commit()
+        return found
+
+    def put(self, record, msg):
+        """
+        Store a parsed email together with metadata from its raw Gmail message.
+
+        Args:
+            record: Email dictionary produced by parse_message
+            msg: The messages().get response the record was parsed from
+        """
+        meta = json.dumps(payload_metadata(msg.get('payload', {})))
+        size = len(record['body'].encode('utf-8')) + len(meta) + len(record['subject']) + len(record['sender'])
+        now = time.time()
+        self.conn.execute(
+            'INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (record['id'], msg.get('threadId'), record['subject'], record['sender'], record['date'],
+             record['internal_date'], record['body'], meta, size, now, now, self.parser_version))
+        self.conn.commit()
+
+    def total_size(self):
+        return self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM messages').fetchone()[0]
+
+    def evict(self):
+        """
+        Drop least recently used messages until the store is below max_bytes.
+
+        Returns:
+            Number of messages removed
+        """
+        total = self.total_size()
+        if total <= self.max_bytes:
+            return 0
+
+        removed = []
+        rows = self.conn.execute('SELECT id, size FROM messages ORDER BY last_used ASC')
+        for message_id, size in rows:
+            if total <= self.max_bytes:
+                break
+            removed.append((message_id,))
+            total -= size
+        self.conn.executemany('DELETE FROM messages WHERE id = ?', removed)
+        self.conn.commit()
+        return len(removed)
+
+    def compact(self):
+        """
+        Evict over-budget entries and reclaim free pages in the database file.
+
+        Returns:
+            Tuple of (messages removed, file size before, file size after)
+        """
+        before = os.path.getsize(self.path)
+        removed = self.evict()
+        self.conn.execute('VACUUM')
+        return removed, before, os.path.getsize(self.path)
+
+    def stats(self):
+        count = self.conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0]
+        return {'messages': count, 'stored_bytes': self.total_size(), 'file_bytes': os.path.getsize(self.path)}
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the local Gmail message store.')
+    parser.add_argument('command', choices=['compact', 'stats'])
+    parser.add_argument('--path', default=MESSAGE_STORE_PATH)
+    parser.add_argument('--max-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='Size budget used when compacting')
+    args = parser.parse_args()
+
+    store = MessageStore(args.path, max_bytes=args.max_mb * 1024 * 1024)
+    if args.command == 'compact':
+        removed, before, after = store.compact()
+        print(f"Removed {removed} messages, database shrank from {before} to {after} bytes")
+    else:
+        print(json.dumps(store.stats(), indent=2))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import re, zlib
+import numpy as np
+from utils.rules import extract_company, extract_role
+
+NUM_PERM = 64
+BANDS = 8
+DEFAULT_THRESHOLD = 0.8
+SHINGLE_WORDS = 3
+# Universal hashes (a * h + b) mod p over the Mersenne prime p = 2**61 - 1, with a
+# and b drawn from all of [1, p) so that each one scrambles the 32-bit shingle hashes
+_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(20240101)
+_A = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+_LOW32 = np.uint64((1 << 32) - 1)
+_LOW29 = np.uint64((1 << 29) - 1)
+
+# What varies between copies of the same template: links, addresses, numbers and IDs
+_VARIABLE_RE = re.compile(r'https?://\S+|www\.\S+|\S+@\S+|\b[\w-]*\d[\w-]*\b')
+
+
+def normalize(text):
+    """Lowercase, mask links, addresses and anything containing digits, collapse whitespace."""
+    return ' '.join(_VARIABLE_RE.sub('#', text.lower()).split())
+
+
+def shingles(text):
+    """CRC32 hashes of the overlapping word n-grams of normalized text."""
+    words = normalize(text).split()
+    if len(words) <= SHINGLE_WORDS:
+        grams = [' '.join(words)]
+    else:
+        grams = [' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    return np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in set(grams)), dtype=np.uint64)
+
+
+def _fold(x):
+    """x mod p for any uint64 x, using 2**61 = 1 (mod p)."""
+    x = (x & np.uint64(_PRIME)) + (x >> np.uint64(61))
+    return np.where(x >= np.uint64(_PRIME), x - np.uint64(_PRIME), x)
+
+
+def universal_hash(hashes):
+    """
+    (a * h + b) mod p for every (a, b) pair and every 32-bit hash h, exactly.
+
+    a * h needs up to 93 bits, so a is split into its high 29 and low 32
+    bits and each partial product, which fits in 64 bits, is reduced
+    separately.
+
+    Returns:
+        Array of shape (NUM_PERM, len(hashes))
+    """
+    h = hashes[None, :]
+    high = _fold((_A >> np.uint64(32))[:, None] * h)
+    low = _fold((_A & _LOW32)[:, None] * h)
+    # high * 2**32 mod p: the bits shifted past 2**61 wrap around to the bottom
+    shifted = _fold((high >> np.uint64(29)) + ((high & _LOW29) << np.uint64(32)))
+    return _fold(shifted + low + _B[:, None])
+
+
+def minhash(text):
+    """NUM_PERM-value MinHash signature; equal positions estimate Jaccard similarity."""
+    return universal_hash(shingles(text)).min(axis=1)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash LSH index of email bodies that have already been seen.
+
+    Signatures are split into BANDS bands; bodies sharing any whole band are
+    candidates, and a candidate only counts when its estimated Jaccard
+    similarity reaches the threshold. Lookups touch one bucket per band
+    instead of every stored body, so indexing n emails is close to linear.
+
+    results holds the classification of each representative once known.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.rows = NUM_PERM // BANDS
+        self.buckets = {}
+        self.signatures = {}
+        self.results = {}
+        self.projected = 0
+
+    def _bands(self, signature):
+        for band in range(BANDS):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def find(self, signature):
+        """
+        Most similar indexed key at or above the threshold, or None.
+        """
+        candidates = set()
+        for band_key in self._bands(signature):
+            candidates.update(self.buckets.get(band_key, ()))
+        best, best_score = None, self.threshold
+        for key in candidates:
+            score = float(np.mean(self.signatures[key] == signature))
+            if score >= best_score:
+                best, best_score = key, score
+        return best
+
+    def add(self, key, signature):
+        self.signatures[key] = signature
+        for band_key in self._bands(signature):
+            self.buckets.setdefault(band_key, []).append(key)
+
+    def remove(self, key):
+        """Forget a key and its result, e.g. a representative that failed."""
+        signature = self.signatures.pop(key, None)
+        self.results.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self._bands(signature):
+            bucket = self.buckets[band_key]
+            bucket.remove(key)
+            if not bucket:
+                del self.buckets[band_key]
+
+
+def project(result, email):
+    """
+    Apply a representative's classification to a near-duplicate member.
+
+    The status comes from the representative; company and role are parsed
+    from the member, since templates are shared across companies and roles.
+
+    Returns:
+        Classification dictionary, or None when the member's company cannot
+        be parsed and it needs its own classification
+    """
+    company = extract_company(email)
+    if not company:
+        return None
+    role = extract_role(f"{email.get('subject', '')} {email.get('body', '')}")
+    if not role and company == result['Company']:
+        role = result['Job Name']
+    return {'Job Name': role, 'Company': company, 'Status': result['Status']}
+
+
+def cluster(texts, threshold=DEFAULT_THRESHOLD):
+    """
+    Group near-duplicate texts.
+
+    Returns:
+        List of clusters, each a list of indices into texts, first index the
+        representative
+    """
+    index = NearDuplicateIndex(threshold)
+    clusters = {}
+    for i, text in enumerate(texts):
+        signature = minhash(text)
+        representative = index.find(signature)
+        if representative is None:
+            index.add(i, signature)
+            clusters[i] = [i]
+        else:
+            clusters[representative].append(i)
+    return list(clusters.values())
+
+
+def sample_emails(count, templates=50):
+    """Synthetic templated ATS emails differing in candidate name, requisition ID and date."""
+    rng = np.random.default_rng(7)
+    vocabulary = ('application team review role hiring process position candidates skills experience '
+                  'opportunity company interest update decision future openings careers profile').split()
+    names = ('Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie')
+    texts = [' '.join(rng.choice(vocabulary, size=60)) for _ in range(templates)]
+    bodies = []
+    for _ in range(count):
+        template = int(rng.integers(templates))
+        bodies.append(f"Dear {rng.choice(names)}, requisition R-{rng.integers(10**5)} received on "
+                      f"2024-0{rng.integers(1, 9)}-1{rng.integers(0, 9)}. {texts[template]}")
+    return bodies
+
+
+def benchmark(count=5000):
+    import time
+    bodies = sample_emails(count)
+    start = time.perf_counter()
+    clusters = cluster(bodies)
+    elapsed = time.perf_counter() - start
+    print(f"Clustered {count} emails into {len(clusters)} clusters in {elapsed:.2f}s "
+          f"({elapsed / count * 1000:.2f} ms per email)")
+
+
+# Run from src/ as a module so the utils imports resolve: python -m utils.near_dup
+if __name__ == "__main__":
+    benchmark()
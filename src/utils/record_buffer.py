@@ -0,0 +1,110 @@
+import pandas as pd
+
+
+class RecordBuffer:
+    """
+    Pending changes to the Applications DataFrame, applied in one step.
+
+    df.loc[len(df)] = entry copies the whole frame for every new row, which
+    makes a large backfill quadratic. New rows are kept here as dictionaries
+    and given the row labels they will have once appended (len(df), len(df)
+    + 1, ...), so callers can index them like existing rows. Cell updates
+    are kept per row. flush() appends every new row with a single concat and
+    writes the updates column by column.
+
+    Args:
+        df: DataFrame with a default RangeIndex
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.new_rows = []
+        self.updates = {}
+
+    def __len__(self):
+        return len(self.df) + len(self.new_rows)
+
+    def append(self, entry):
+        """Queue a new row. Returns the row label it will have."""
+        self.new_rows.append(dict(entry))
+        return len(self) - 1
+
+    def _new_row(self, row):
+        position = row - len(self.df)
+        return self.new_rows[position] if position >= 0 else None
+
+    def get(self, row, column):
+        """Current value of a cell, pending changes included."""
+        new_row = self._new_row(row)
+        if new_row is not None:
+            return new_row.get(column, '')
+        pending = self.updates.get(row, {})
+        return pending[column] if column in pending else self.df.at[row, column]
+
+    def set(self, row, column, value):
+        new_row = self._new_row(row)
+        if new_row is not None:
+            new_row[column] = value
+        else:
+            self.updates.setdefault(row, {})[column] = value
+
+    def flush(self):
+        """
+        Apply the pending changes to the DataFrame.
+
+        Returns:
+            The updated DataFrame; when rows were added it is a new object
+        """
+        if self.updates:
+            changes = pd.DataFrame.from_dict(self.updates, orient='index')
+            for column in changes.columns:
+                values = changes[column].dropna()
+                if column not in self.df.columns:
+                    self.df[column] = ''
+                # Sheet values are strings; numeric cells from get_all_records would reject them
+                if self.df[column].dtype != object:
+                    self.df[column] = self.df[column].astype(object)
+                self.df.loc[values.index, column] = values
+        if self.new_rows:
+            added = pd.DataFrame(self.new_rows).reindex(columns=self.df.columns, fill_value='')
+            frames = [frame for frame in (self.df, added) if len(frame)]
+            self.df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else added
+        self.new_rows, self.updates = [], {}
+        return self.df
+
+
+def sample_entries(count):
+    """Synthetic application rows in the sheet's column layout."""
+    return [{'Status': 'Received', 'Company': f'Company {i}', 'Date Applied': '01/01/2024',
+             'Last Updated': '01/01/2024', 'Link': '', 'Role': 'Software Intern',
+             'Company ID': f'C{i:04d}', 'Job ID': ''} for i in range(count)]
+
+
+def benchmark(counts=(1000, 5000)):
+    """Compare one df.loc append per row with a single RecordBuffer flush."""
+    import time
+    columns = list(sample_entries(1)[0])
+    for count in counts:
+        entries = sample_entries(count)
+
+        df = pd.DataFrame(columns=columns)
+        start = time.perf_counter()
+        for entry in entries:
+            df.loc[len(df)] = entry
+        looped = time.perf_counter() - start
+
+        start = time.perf_counter()
+        buffer = RecordBuffer(pd.DataFrame(columns=columns))
+        for entry in entries:
+            row = buffer.append(entry)
+            buffer.set(row, 'Status', 'Rejected')
+        buffered = buffer.flush()
+        elapsed = time.perf_counter() - start
+
+        assert len(buffered) == len(df) == count
+        print(f"{count} new rows: df.loc appends {looped:.2f}s, RecordBuffer {elapsed:.3f}s "
+              f"({looped / elapsed:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    benchmark()
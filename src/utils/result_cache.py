@@ -0,0 +1,132 @@
+import argparse, hashlib, json, os, sqlite3, time
+
+RESULT_CACHE_PATH = os.path.join('config', 'classifications.db')
+DEFAULT_MAX_ENTRIES = 50000
+
+
+def cache_key(subject, body, model, prompt_version):
+    """
+    Hash of everything that decides a classification: the normalized
+    subject and body, the model and the prompt version.
+    """
+    normalized = ' '.join(subject.lower().split()) + '\0' + ' '.join(body.lower().split())
+    material = '\0'.join((normalized, model, str(prompt_version)))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite-backed cache of validated classifications keyed by cache_key().
+
+    Least recently used entries are evicted past max_entries. invalidate()
+    drops entries for a model and/or prompt version explicitly.
+    """
+
+    def __init__(self, path=RESULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                prompt_version TEXT,
+                result TEXT,
+                created_at REAL,
+                last_used REAL
+            )''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_results_last_used ON results (last_used)')
+        self.conn.commit()
+
+    def get(self, key):
+        return self.get_first([key])
+
+    def get_first(self, keys):
+        """Result for the first key that is cached, counted as a single hit or miss."""
+        for key in keys:
+            row = self.conn.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self.hits += 1
+                self.conn.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+                self.conn.commit()
+                return json.loads(row[0])
+        self.misses += 1
+        return None
+
+    def put(self, key, model, prompt_version, result):
+        now = time.time()
+        self.conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                          (key, model, str(prompt_version), json.dumps(result), now, now))
+        self.conn.commit()
+
+    def evict(self):
+        """Drop least recently used entries beyond max_entries. Returns the number removed."""
+        count = self.conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        self.conn.execute('DELETE FROM results WHERE key IN '
+                          '(SELECT key FROM results ORDER BY last_used ASC LIMIT ?)', (excess,))
+        self.conn.commit()
+        return excess
+
+    def invalidate(self, model=None, prompt_version=None, keep=False):
+        """
+        Delete cached results.
+
+        Args:
+            model: Only entries for this model (all models when None)
+            prompt_version: Only entries for this prompt version (all when None)
+            keep: Invert the match and delete everything except those entries,
+                e.g. to drop results from every other model or prompt
+
+        Returns:
+            Number of entries removed
+        """
+        conditions, params = [], []
+        if model is not None:
+            conditions.append('model = ?')
+            params.append(model)
+        if prompt_version is not None:
+            conditions.append('prompt_version = ?')
+            params.append(str(prompt_version))
+        where = ' AND '.join(conditions) or '1'
+        if keep:
+            where = f'NOT ({where})'
+        cursor = self.conn.execute(f'DELETE FROM results WHERE {where}', params)
+        self.conn.commit()
+        return cursor.rowcount
+
+    def stats(self):
+        rows = self.conn.execute('SELECT model, prompt_version, COUNT(*) FROM results GROUP BY model, prompt_version')
+        return [{'model': model, 'prompt_version': version, 'entries': count} for model, version, count in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the classification result cache.')
+    parser.add_argument('command', choices=['invalidate', 'stats'])
+    parser.add_argument('--path', default=RESULT_CACHE_PATH)
+    parser.add_argument('--model', help='Only entries for this model')
+    parser.add_argument('--prompt-version', help='Only entries for this prompt version')
+    parser.add_argument('--keep', action='store_true',
+                        help='Delete everything except the matching entries')
+    args = parser.parse_args()
+
+    cache = ResultCache(args.path)
+    if args.command == 'invalidate':
+        removed = cache.invalidate(args.model, args.prompt_version, keep=args.keep)
+        cache.conn.execute('VACUUM')
+        print(f"Removed {removed} cached classifications")
+    else:
+        print(json.dumps(cache.stats(), indent=2))
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
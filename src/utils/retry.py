@@ -0,0 +1,113 @@
+import random, socket, threading, time
+from collections import Counter
+from googleapiclient.errors import HttpError
+from gspread.exceptions import APIError
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Gmail reports per-user rate limiting as a 403 with one of these reasons
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+DEFAULT_MAX_RETRIES = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 64.0
+
+# Every Gmail and Sheets call shares this budget of concurrent requests
+_budget = threading.BoundedSemaphore(8)
+_counter_lock = threading.Lock()
+call_counts = Counter()
+retry_counts = Counter()
+
+
+def set_concurrency(limit):
+    """Change how many API requests may be in flight at once across all callers."""
+    global _budget
+    _budget = threading.BoundedSemaphore(max(1, limit))
+
+
+def concurrency_slot():
+    """Context manager holding one slot of the shared request budget."""
+    return _budget
+
+
+def retry_info(exception):
+    """
+    Decide whether a failed API call is worth retrying.
+
+    Returns:
+        Tuple of (retryable, Retry-After seconds or None)
+    """
+    if isinstance(exception, HttpError):
+        status = exception.resp.status
+        retry_after = exception.resp.get('retry-after')
+        if status == 403:
+            content = exception.content.decode('utf-8', errors='replace') if isinstance(exception.content, bytes) else str(exception.content)
+            return any(reason in content for reason in RATE_LIMIT_REASONS), retry_after
+        return status in RETRYABLE_STATUSES, retry_after
+    if isinstance(exception, APIError):
+        return exception.response.status_code in RETRYABLE_STATUSES, exception.response.headers.get('Retry-After')
+    if isinstance(exception, (ConnectionError, TimeoutError, socket.timeout)):
+        return True, None
+    return False, None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Seconds to wait before retry number attempt (starting at 0). A usable
+    Retry-After value wins, otherwise exponential backoff with full jitter.
+    """
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), MAX_DELAY)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * (2 ** attempt)))
+
+
+def record_call(endpoint):
+    with _counter_lock:
+        call_counts[endpoint] += 1
+
+
+def record_retry(endpoint):
+    with _counter_lock:
+        retry_counts[endpoint] += 1
+
+
+def call(fn, endpoint, max_retries=DEFAULT_MAX_RETRIES):
+    """
+    Run fn() inside the shared concurrency budget, retrying rate limit,
+    server and connection errors with backoff.
+
+    Args:
+        fn: Zero-argument callable making one API request
+        endpoint: Name the call is counted under, e.g. 'gmail.messages.list'
+        max_retries: Retries before the last error is raised
+
+    Returns:
+        Whatever fn returns
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            with _budget:
+                record_call(endpoint)
+                return fn()
+        except Exception as e:
+            retryable, retry_after = retry_info(e)
+            if not retryable or attempt == max_retries:
+                raise
+            record_retry(endpoint)
+            delay = backoff_delay(attempt, retry_after)
+            print(f"{endpoint} failed ({e}), retrying in {delay:.1f}s ({attempt + 1}/{max_retries})")
+            time.sleep(delay)
+
+
+def execute(request, endpoint, max_retries=DEFAULT_MAX_RETRIES):
+    """Execute a googleapiclient request through call()."""
+    return call(request.execute, endpoint, max_retries=max_retries)
+
+
+def retry_stats():
+    """Per-endpoint request and retry counts for this process."""
+    with _counter_lock:
+        return {endpoint: {'calls': call_counts[endpoint], 'retries': retry_counts[endpoint]}
+                for endpoint in sorted(set(call_counts) | set(retry_counts))}
@@ -0,0 +1,194 @@
+import re
+from email.utils import parseaddr
+
+# Applicant tracking systems that send on behalf of the hiring company
+ATS_DOMAINS = (
+    'greenhouse.io', 'greenhouse-mail.io', 'lever.co', 'myworkday.com', 'workday.com', 'icims.com',
+    'smartrecruiters.com', 'ashbyhq.com', 'jobvite.com', 'taleo.net', 'successfactors.com',
+    'bamboohr.com', 'workablemail.com', 'workable.com', 'brassring.com', 'eightfold.ai', 'avature.net',
+    'phenompeople.com', 'oraclecloud.com', 'paradox.ai', 'hirevue.com'
+)
+# Mailbox providers and job boards whose domain says nothing about the employer
+GENERIC_DOMAINS = (
+    'gmail.com', 'googlemail.com', 'outlook.com', 'hotmail.com', 'yahoo.com', 'icloud.com', 'aol.com',
+    'linkedin.com', 'indeed.com', 'handshake.com', 'joinhandshake.com', 'ziprecruiter.com', 'glassdoor.com'
+)
+
+# Anything that needs judgement goes to the model
+DEFER_RE = re.compile(
+    r'\binterview|\bschedul(?:e|ing)\b|\bassessment\b|\bcoding challenge\b|\bhackerrank\b|\bcodesignal\b'
+    r'|\boffer letter\b|\bpleased to offer\b|\bextend (?:you )?an offer\b|\bnext steps?\b',
+    re.IGNORECASE)
+REJECTED_RE = re.compile(
+    r'\b(?:not|unable to) (?:to |be )?(?:moving|move|proceed|proceeding) forward\b|\bdecided (?:to|not to) [^.]{0,40}?other candidates\b'
+    r'|\bpursue other candidates\b|\bwill not be (?:proceeding|progressing|advancing)\b'
+    r'|\bunable to offer you\b|\bregret to inform\b|\bposition has (?:been|now been) filled\b'
+    r'|\bno longer (?:under consideration|being considered)\b|\bnot been selected\b'
+    r'|\bother candidates whose (?:qualifications|experience|skills)\b',
+    re.IGNORECASE)
+# Bad news REJECTED_RE does not know; an acknowledgement with any of these is not a plain Received
+NEGATIVE_RE = re.compile(
+    r'\bunfortunately\b|\bunable to\b|\bnot be able to\b|\bdecided not to\b|\bother (?:applicants|candidates)\b'
+    r'|\b(?:pursue|proceed with|move forward with) (?:other )?(?:candidates|applicants)\b|\bmore closely match'
+    r'|\bnot (?:to )?(?:proceed|progress|advance|continue)\b|\bnot (?:a |the right )?(?:fit|match)\b'
+    r'|\bregret\b|\bdecision\b',
+    re.IGNORECASE)
+# A Received answer needs the acknowledgement to be the whole message; anything
+# longer may go on to a decision worded in a way NEGATIVE_RE does not know
+RECEIVED_MAX_CHARS = 400
+RECEIVED_RE = re.compile(
+    r'\bthank(?:s| you) for (?:applying|your application|submitting your application)\b'
+    r'|\bwe(?:\'ve| have) received your application\b|\bapplication (?:has been |was )?(?:received|submitted)\b'
+    r'|\bapplication confirmation\b|\bsuccessfully (?:applied|submitted)\b',
+    re.IGNORECASE)
+
+# Up to five capitalized words; a '.' only inside a word, so a sentence end stops the name
+_WORD = r"[A-Z0-9][\w&'-]*(?:\.[\w&'-]+)*"
+_NAME = rf"({_WORD}(?: (?:&|and|of|{_WORD})){{0,4}})"
+COMPANY_RES = [re.compile(pattern) for pattern in (
+    r'\b(?:applying|application|apply|interest) (?:to|at|with|in) ' + _NAME,
+    r'\b(?i:positions?|roles?|opportunit(?:y|ies)|internships?|jobs?|team) (?:at|with) ' + _NAME,
+    r'\b(?:[Cc]areers|[Rr]ecruiting|[Tt]alent [Aa]cquisition) (?:at|with) ' + _NAME,
+)]
+# Words that follow a company name in a sender's display name
+SENDER_SUFFIX_RE = re.compile(
+    r'\s*(?:[-|@]\s*)?(?:University |Campus |Early Career |Global )?'
+    r'(?:Careers?|Recruiting|Recruitment|Talent(?: Acquisition)?|Jobs|Hiring(?: Team)?|HR|Team|Workday|Notifications?)'
+    r'(?:\s+(?:Team|Department))?\s*$',
+    re.IGNORECASE)
+ROLE_RES = [
+    re.compile(r'\b(?:for|to) (?:the|our) (?:position of |role of )?([^.,;:!?]{3,80}?) '
+               r'(?:position|role|opening|opportunity)\b', re.IGNORECASE),
+    re.compile(r'\b(?:position|role) of ([^.,;:!?]{3,80}?)[.,;]', re.IGNORECASE),
+    re.compile(r'\bfor (?:the |our |an? )?([A-Z][^.,;:!?]{2,60}? Intern(?:ship)?)\b'),
+]
+# Requisition numbers: "Job ID: 12345", "Req #R-0042", "Requisition JR10023", "(R123456)"
+JOB_ID_RE = re.compile(r'\b(?:job\s*(?:id|number|no\.|#)|req(?:uisition)?\.?\s*(?:id|number|no\.?)?)\s*[:#]?\s*'
+                       r'([A-Z]{0,4}-?\d{3,}(?:-\d+)?)\b|\(([A-Z]{1,4}-?\d{4,})\)', re.IGNORECASE)
+# Capitalized words the company patterns pick up that are not company names
+NOT_COMPANIES = {'the', 'our', 'this', 'your', 'a', 'an', 'us', 'we', 'position', 'role', 'team', 'company'}
+# A name starting with one of these is a date or a cohort ("Summer 2025"), not a company
+SEASON_WORDS = {'spring', 'summer', 'fall', 'autumn', 'winter'}
+# Words of a job title; a name containing one is a role, not a company
+ROLE_WORDS = {'intern', 'interns', 'internship', 'internships', 'co-op', 'coop', 'apprentice', 'apprenticeship',
+              'fellowship', 'engineer', 'developer', 'analyst', 'scientist', 'designer', 'manager', 'associate',
+              'specialist', 'researcher', 'position', 'role', 'opening', 'program', 'programme'}
+
+
+def sender_domain(sender):
+    """Lowercased domain of a From header, or '' when there is none."""
+    address = parseaddr(sender)[1]
+    return address.rsplit('@', 1)[1].lower() if '@' in address else ''
+
+
+def _domain_matches(domain, candidates):
+    return any(domain == candidate or domain.endswith('.' + candidate) for candidate in candidates)
+
+
+def employer_domain(sender):
+    """Sender domain when it identifies the employer, '' for ATS and mailbox domains."""
+    domain = sender_domain(sender)
+    if not domain or _domain_matches(domain, ATS_DOMAINS + GENERIC_DOMAINS):
+        return ''
+    return domain
+
+
+def _clean_name(name):
+    name = name.strip(" .,'-")
+    if not name or name.lower() in NOT_COMPANIES:
+        return ''
+    words = name.lower().split()
+    if any(word.strip(".,'") in ROLE_WORDS for word in words):
+        return ''
+    if words[0] in SEASON_WORDS or words[0][0].isdigit():
+        return ''
+    return name
+
+
+def extract_company(email):
+    """
+    Cheap company extraction from phrases, the sender name and the sender domain.
+
+    Returns:
+        Company name, or '' when nothing trustworthy was found
+    """
+    for text in (email.get('subject', ''), email.get('body', '')):
+        for pattern in COMPANY_RES:
+            # A rejected candidate ("interest in Summer 2025 ...") may be followed by a real one
+            for match in pattern.finditer(text):
+                name = _clean_name(match.group(1))
+                if name:
+                    return name
+
+    display_name, address = parseaddr(email.get('sender', ''))
+    domain = sender_domain(email.get('sender', ''))
+    # Job boards and mailbox providers put their own name in the display name ("Indeed Jobs")
+    if display_name and not _domain_matches(domain, GENERIC_DOMAINS):
+        name = _clean_name(SENDER_SUFFIX_RE.sub('', display_name))
+        # A bare person's name is not a company; only trust names that had a suffix removed
+        if name and name != display_name.strip():
+            return name
+    if domain and _domain_matches(domain, ('myworkday.com',)):
+        # Workday sends from <company>@myworkday.com
+        return address.split('@', 1)[0].replace('_', ' ').title()
+    if employer_domain(email.get('sender', '')):
+        labels = domain.split('.')
+        return labels[-2].title() if len(labels) >= 2 else ''
+    return ''
+
+
+def extract_role(text):
+    """Position title from common ATS phrasing, or '' when there is none."""
+    for pattern in ROLE_RES:
+        match = pattern.search(text)
+        if match:
+            return match.group(1).strip()
+    return ''
+
+
+def extract_job_id(text):
+    """Requisition number in upper case, or '' when there is none."""
+    match = JOB_ID_RE.search(text)
+    return (match.group(1) or match.group(2)).upper() if match else ''
+
+
+class RuleClassifier:
+    """
+    Deterministic pre-classifier for templated ATS emails (acknowledgements
+    and rejections). It only answers when a status phrase matches, nothing
+    in the email needs judgement, and a company can be extracted; anything
+    else falls through to the model. Acknowledgements are only answered
+    when they are short, since most rejections open with one.
+    """
+
+    def __init__(self):
+        self.seen = 0
+        self.hits = 0
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.seen if self.seen else 0.0
+
+    def classify(self, email):
+        """
+        Returns:
+            Dictionary with 'Job Name', 'Company' and 'Status', or None
+        """
+        self.seen += 1
+        text = f"{email.get('subject', '')} {email.get('body', '')}"
+        if DEFER_RE.search(text):
+            return None
+        if REJECTED_RE.search(text):
+            status = 'Rejected'
+        elif NEGATIVE_RE.search(text):
+            # Probably a rejection worded in a way the patterns miss
+            return None
+        elif RECEIVED_RE.search(text) and len(email.get('body', '')) <= RECEIVED_MAX_CHARS:
+            status = 'Received'
+        else:
+            return None
+        company = extract_company(email)
+        if not company:
+            return None
+        self.hits += 1
+        return {'Job Name': extract_role(text), 'Company': company, 'Status': status}
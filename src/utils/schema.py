@@ -0,0 +1,71 @@
+import json
+from typing import Literal
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+STATUSES = ("Received", "Rejected", "Reviewing", "Interview", "Accepted", "Draft")
+
+
+class Classification(BaseModel):
+    """What the model extracts from one email, keyed the way the prompt names the fields."""
+    model_config = ConfigDict(populate_by_name=True)
+
+    job_name: str = Field(alias='Job Name')
+    company: str = Field(alias='Company')
+    status: Literal[STATUSES] = Field(alias='Status')
+
+
+class BatchItem(Classification):
+    """One email's classification inside a batched reply."""
+    id: str = Field(alias='ID')
+
+    # The ID is generated first so the model commits to which email it is answering
+    model_config = ConfigDict(populate_by_name=True, json_schema_extra=lambda schema: schema.update(
+        properties={'ID': schema['properties'].pop('ID'), **schema['properties']}))
+
+
+class BatchClassification(BaseModel):
+    results: list[BatchItem]
+
+
+# Passed to Ollama as `format` so decoding is constrained to this shape
+CLASSIFICATION_SCHEMA = Classification.model_json_schema(by_alias=True)
+BATCH_SCHEMA = BatchClassification.model_json_schema(by_alias=True)
+
+
+def parse_classification(content):
+    """
+    Validate a model reply against Classification.
+
+    Returns:
+        Dictionary with 'Job Name', 'Company' and 'Status', or None when the
+        reply is not valid JSON or does not match the schema
+    """
+    try:
+        return Classification.model_validate_json(content).model_dump(by_alias=True)
+    except ValidationError:
+        return None
+
+
+def parse_batch(content):
+    """
+    Validate a batched reply item by item, so one malformed entry does not
+    discard the rest.
+
+    Returns:
+        Dictionary mapping email ID to its classification dictionary; IDs
+        whose entry is missing or invalid are absent
+    """
+    try:
+        items = json.loads(content).get('results', [])
+    except (json.JSONDecodeError, AttributeError):
+        return {}
+    if not isinstance(items, list):
+        return {}
+    parsed = {}
+    for item in items:
+        try:
+            result = BatchItem.model_validate(item).model_dump(by_alias=True)
+        except ValidationError:
+            continue
+        parsed[result.pop('ID')] = result
+    return parsed
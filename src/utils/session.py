@@ -0,0 +1,162 @@
+import json, logging, math, os, threading, time
+import ollama
+from utils.body_reducer import estimate_tokens
+
+SESSION_STATS_PATH = os.path.join('config', 'session_stats.json')
+MIN_CTX = 2048
+MAX_CTX = 32768
+CTX_STEP = 512
+# Prompt sizes remembered from earlier runs to size the context window
+MAX_SAMPLES = 1000
+# A classification is a few dozen tokens; leave room for long titles and company names
+DEFAULT_NUM_PREDICT = 128
+# Structured output ends at the closing brace; these catch a model that keeps talking
+STOP_SEQUENCES = ['```', '\n\n\n']
+
+
+class ModelSession:
+    """
+    Keep one model loaded and consistently configured for a run.
+
+    warm_up() loads the model in the background while Gmail is fetched, and
+    every request renews a long keep_alive so idle gaps during fetching do not
+    unload it. It stays finite so a crashed run does not pin the model
+    forever; close() hands it back to Ollama's normal idle timeout. Every
+    request uses the same options, because a different num_ctx makes Ollama
+    reload the model.
+
+    num_ctx is sized from the lengths of the prompts sent in earlier runs,
+    kept in config/session_stats.json per model and prompt bound. Ollama's
+    prompt_eval_count leaves out the instruction prefix it reuses from the
+    KV cache, so the length is estimated from the messages themselves. Before
+    there is any history it falls back to that bound, the largest prompt
+    the body budget allows.
+    """
+
+    def __init__(self, model, fallback_prompt_tokens, num_predict=DEFAULT_NUM_PREDICT,
+                 keep_alive='30m', release_keep_alive='5m', path=SESSION_STATS_PATH):
+        self.model = model
+        self.keep_alive = keep_alive
+        self.num_predict = num_predict
+        self.release_keep_alive = release_keep_alive
+        self.path = path
+        # Changing the body budget or batching starts a new history; v2 samples are
+        # full prompt lengths rather than prompt_eval_count
+        self.key = f'{model}:{fallback_prompt_tokens}:v2'
+        self.samples = self._load_samples()
+        self.num_ctx = context_size(self.samples or [fallback_prompt_tokens], num_predict)
+        self.load_seconds = None
+        self.calls = []
+        self.prompt_tokens = []
+        self._warm_up_thread = None
+
+    def _load_samples(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f).get(self.key, [])
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    def options(self, items=1):
+        """
+        Request options for a reply covering `items` emails.
+
+        num_ctx stays fixed for the run; only num_predict grows with a batch.
+        """
+        return {'num_ctx': self.num_ctx, 'num_predict': self.num_predict * items, 'stop': STOP_SEQUENCES}
+
+    def request_kwargs(self, items=1):
+        """Keyword arguments to add to ollama.chat / AsyncClient.chat."""
+        return {'options': self.options(items), 'keep_alive': self.keep_alive}
+
+    def _warm_up(self):
+        start = time.perf_counter()
+        try:
+            # An empty prompt only loads the model
+            response = ollama.generate(model=self.model, prompt='', options={'num_ctx': self.num_ctx},
+                                       keep_alive=self.keep_alive)
+            load_duration = response.get('load_duration')
+            self.load_seconds = load_duration / 1e9 if load_duration else time.perf_counter() - start
+        except Exception as e:
+            print(f"Model warm-up failed, the first request will load {self.model}: {e}")
+
+    def warm_up(self):
+        """Start loading the model on a background thread."""
+        self._warm_up_thread = threading.Thread(target=self._warm_up, daemon=True)
+        self._warm_up_thread.start()
+
+    def wait_until_ready(self):
+        if self._warm_up_thread:
+            self._warm_up_thread.join()
+            self._warm_up_thread = None
+
+    def record(self, response, messages=()):
+        """
+        Keep the size of one prompt and the timings Ollama reports for it.
+
+        Args:
+            response: Final chat response, or None when a stream was cut
+                off before Ollama sent its timings
+            messages: Chat messages that were sent
+        """
+        prompt_tokens = estimate_tokens(''.join(message['content'] for message in messages))
+        if response is not None:
+            prompt_tokens = max(prompt_tokens, response.get('prompt_eval_count') or 0)
+        if prompt_tokens:
+            self.prompt_tokens.append(prompt_tokens)
+        if response is None:
+            return
+        call = {key: response.get(key) or 0 for key in
+                ('load_duration', 'prompt_eval_count', 'prompt_eval_duration', 'eval_count', 'eval_duration')}
+        self.calls.append(call)
+        logging.info(f"Ollama call: prompt {call['prompt_eval_count']} tokens in "
+                     f"{call['prompt_eval_duration'] / 1e6:.0f} ms, generated {call['eval_count']} tokens in "
+                     f"{call['eval_duration'] / 1e6:.0f} ms")
+
+    def summary(self):
+        """Load time and mean per-call timings in milliseconds."""
+        count = len(self.calls)
+        mean = lambda key: sum(call[key] for call in self.calls) / count if count else 0
+        eval_seconds = sum(call['eval_duration'] for call in self.calls) / 1e9
+        return {
+            'model': self.model,
+            'num_ctx': self.num_ctx,
+            'load_seconds': self.load_seconds,
+            'calls': count,
+            'mean_prompt_tokens': mean('prompt_eval_count'),
+            'mean_prompt_eval_ms': mean('prompt_eval_duration') / 1e6,
+            'mean_eval_ms': mean('eval_duration') / 1e6,
+            'generated_tokens_per_second': sum(call['eval_count'] for call in self.calls) / eval_seconds
+                                           if eval_seconds else 0.0,
+        }
+
+    def close(self):
+        """Save this run's prompt sizes and return the model to the normal idle timeout."""
+        samples = self.samples + self.prompt_tokens
+        try:
+            with open(self.path) as f:
+                stats = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            stats = {}
+        stats[self.key] = samples[-MAX_SAMPLES:]
+        with open(self.path, 'w') as f:
+            json.dump(stats, f)
+        try:
+            ollama.generate(model=self.model, prompt='', options={'num_ctx': self.num_ctx},
+                            keep_alive=self.release_keep_alive)
+        except Exception as e:
+            logging.warning(f"Could not release keep_alive for {self.model}: {e}")
+
+
+def context_size(prompt_tokens, num_predict, quantile=0.99, headroom=1.1):
+    """
+    Context window covering nearly all prompts plus the reply.
+
+    Prompts longer than num_ctx are truncated from the front, which drops
+    the instructions, so this sizes for a high quantile with headroom rather
+    than the median. Rounded up to CTX_STEP and clamped to [MIN_CTX, MAX_CTX].
+    """
+    ordered = sorted(prompt_tokens)
+    index = min(len(ordered) - 1, math.ceil(quantile * len(ordered)) - 1)
+    needed = ordered[max(index, 0)] * headroom + num_predict
+    return max(MIN_CTX, min(MAX_CTX, math.ceil(needed / CTX_STEP) * CTX_STEP))
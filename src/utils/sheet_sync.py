@@ -0,0 +1,110 @@
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+from utils import retry
+
+# The header is row 1; DataFrame row 0 is sheet row 2
+FIRST_ROW = 2
+
+
+def _cell(value):
+    return '' if pd.isna(value) else value
+
+
+def _rows(df, columns):
+    """Sheet values of df in the given column order; missing columns are blank."""
+    return [[_cell(value) for value in row] for row in df.reindex(columns=columns).values.tolist()]
+
+
+def changed_ranges(old_rows, new_rows, width):
+    """
+    Changed cells of rows present in both snapshots, grouped into rectangles.
+
+    Each row's changed cells are split into runs of adjacent columns, and a
+    run continues the rectangle above it when it covers the same columns.
+
+    Returns:
+        List of (first row, last row, first column, last column), 0-based
+        and inclusive
+    """
+    ranges = []
+    open_ranges = {}
+    for i, (old, new) in enumerate(zip(old_rows, new_rows)):
+        runs = []
+        start = None
+        for column in range(width + 1):
+            changed = column < width and str(old[column]) != str(new[column])
+            if changed and start is None:
+                start = column
+            elif not changed and start is not None:
+                runs.append((start, column - 1))
+                start = None
+        still_open = {}
+        for run in runs:
+            rectangle = open_ranges.get(run)
+            if rectangle is None:
+                rectangle = [i, i, run[0], run[1]]
+                ranges.append(rectangle)
+            rectangle[1] = i
+            still_open[run] = rectangle
+        open_ranges = still_open
+    return [tuple(rectangle) for rectangle in ranges]
+
+
+def sheet_diff(old, new):
+    """
+    Value ranges that turn the sheet holding old into one holding new.
+
+    Changed cells are written in place, rows beyond the end of old are
+    written as one block, and rows only old had are blanked.
+
+    Returns:
+        List of {'range': A1 range, 'values': rows} for Worksheet.batch_update
+    """
+    columns = list(new.columns)
+    width = len(columns)
+    old_rows = _rows(old, columns)
+    new_rows = _rows(new, columns)
+    data = []
+    for first, last, left, right in changed_ranges(old_rows, new_rows, width):
+        data.append({
+            'range': f'{rowcol_to_a1(FIRST_ROW + first, left + 1)}:{rowcol_to_a1(FIRST_ROW + last, right + 1)}',
+            'values': [row[left:right + 1] for row in new_rows[first:last + 1]],
+        })
+    if len(new_rows) > len(old_rows):
+        block = new_rows[len(old_rows):]
+    else:
+        # Blank every column the old rows used, including any the new frame dropped
+        width = max(width, len(old.columns))
+        block = [[''] * width for _ in range(len(old_rows) - len(new_rows))]
+    if block and width:
+        first = FIRST_ROW + min(len(old_rows), len(new_rows))
+        data.append({
+            'range': f'{rowcol_to_a1(first, 1)}:{rowcol_to_a1(first + len(block) - 1, width)}',
+            'values': block,
+        })
+    return data
+
+
+def sync_sheet(worksheet, old, new):
+    """
+    Bring a worksheet last synced from old up to date with new in a single
+    batch_update call.
+
+    Args:
+        worksheet: gspread Worksheet whose rows below the header hold old
+        old: DataFrame as last read from or written to the worksheet
+        new: DataFrame to write
+
+    Returns:
+        Dictionary with the number of ranges and cells written, and the
+        rows appended and blanked
+    """
+    data = sheet_diff(old, new)
+    if data:
+        retry.call(lambda: worksheet.batch_update(data), 'sheets.batch_update')
+    return {
+        'ranges': len(data),
+        'cells': sum(len(row) for entry in data for row in entry['values']),
+        'appended': max(0, len(new) - len(old)),
+        'cleared': max(0, len(old) - len(new)),
+    }
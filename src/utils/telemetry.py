@@ -0,0 +1,94 @@
+import json, math, os, statistics, time
+
+INFERENCE_METRICS_PATH = os.path.join('config', 'inference_metrics.jsonl')
+# Timing and token fields Ollama returns with every completed chat response
+RESPONSE_FIELDS = ('total_duration', 'load_duration', 'prompt_eval_count', 'prompt_eval_duration',
+                   'eval_count', 'eval_duration')
+
+
+def response_metadata(response, wall_seconds):
+    """
+    The RESPONSE_FIELDS of an Ollama response plus the client-side wall time.
+
+    A streamed reply that was cut off has no final response, so only the
+    wall time is known.
+    """
+    metadata = {field: response.get(field) if response is not None else None for field in RESPONSE_FIELDS}
+    metadata['wall_ms'] = round(wall_seconds * 1000, 1)
+    return metadata
+
+
+class InferenceMetrics:
+    """
+    Per-email inference records appended to a JSON Lines file, one line per
+    email per model request, plus an end-of-run summary.
+
+    Emails that shared a batched request share its metadata; request_emails
+    says how many, and the summary divides durations and token counts by it.
+    """
+
+    def __init__(self, path=INFERENCE_METRICS_PATH):
+        self.path = path
+        self.records = []
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'a')
+
+    def record(self, email, model, metadata, outcome, request_emails=1):
+        """
+        Args:
+            email: Email dictionary that was classified
+            model: Ollama model name
+            metadata: Dictionary from response_metadata(), or None when the
+                request failed before any reply
+            outcome: 'valid', 'invalid', 'missing' (absent from a batched
+                reply) or 'failed' (no reply)
+            request_emails: Number of emails the request carried
+        """
+        record = {
+            'time': time.time(),
+            'email_id': email['id'],
+            'body_chars': len(email.get('body', '')),
+            'model': model,
+            'outcome': outcome,
+            'request_emails': request_emails,
+            **(metadata or response_metadata(None, 0.0)),
+        }
+        self.records.append(record)
+        self.file.write(json.dumps(record) + '\n')
+
+    def summary(self):
+        """
+        Per-email latency percentiles in milliseconds, generation speed and
+        prompt tokens per email for this run.
+        """
+        latencies, prompt_tokens = [], []
+        eval_count = eval_ns = 0
+        for record in self.records:
+            share = record['request_emails'] or 1
+            total = record['total_duration']
+            latencies.append(total / 1e6 / share if total else record['wall_ms'] / share)
+            if record['prompt_eval_count']:
+                prompt_tokens.append(record['prompt_eval_count'] / share)
+            if record['eval_count'] and record['eval_duration']:
+                eval_count += record['eval_count'] / share
+                eval_ns += record['eval_duration'] / share
+        return {
+            'emails': len(self.records),
+            'outcomes': {outcome: sum(1 for r in self.records if r['outcome'] == outcome)
+                         for outcome in sorted({r['outcome'] for r in self.records})},
+            'p50_latency_ms': percentile(latencies, 0.50),
+            'p95_latency_ms': percentile(latencies, 0.95),
+            'tokens_per_second': eval_count / (eval_ns / 1e9) if eval_ns else 0.0,
+            'prompt_tokens_per_email': statistics.fmean(prompt_tokens) if prompt_tokens else 0.0,
+        }
+
+    def close(self):
+        self.file.close()
+
+
+def percentile(values, q):
+    """Nearest-rank percentile; 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
@@ -0,0 +1,26 @@
+def collapse_threads(messages):
+    """
+    Keep one message per Gmail thread.
+
+    Classifications are applied to the sheet oldest first, so only the newest
+    message of a thread decides the final row. Gmail lists messages newest
+    first, so the first message seen for a thread is the one to classify.
+
+    Args:
+        messages: List of {'id', 'threadId'} stubs, newest first
+
+    Returns:
+        Tuple of (representative stubs newest first, dictionary mapping each
+        representative's ID to the IDs of every listed message in its thread)
+    """
+    members = {}
+    representatives = []
+    representative_of = {}
+    for message in messages:
+        thread_id = message.get('threadId') or message['id']
+        if thread_id not in representative_of:
+            representative_of[thread_id] = message['id']
+            representatives.append(message)
+            members[message['id']] = []
+        members[representative_of[thread_id]].append(message['id'])
+    return representatives, members
@@ -0,0 +1,72 @@
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import pandas as pd
+
+from utils.aliases import AliasTable, index_company_ids, normalize_company
+
+
+class Worksheet:
+    def __init__(self, rows=()):
+        self.rows = [['Company', 'Company ID', 'Role'], *rows]
+        self.appended = []
+
+    def get_all_values(self):
+        return self.rows
+
+    def append_rows(self, rows, value_input_option=None):
+        self.appended.extend(rows)
+
+
+class NormalizeCompanyTest(unittest.TestCase):
+    def test_legal_forms_and_punctuation(self):
+        self.assertEqual(normalize_company('Acme, Inc.'), 'acme')
+        self.assertEqual(normalize_company('Procter & Gamble Co'), 'procter and gamble')
+        self.assertEqual(normalize_company('The Company'), 'the company')
+
+
+class AliasTableTest(unittest.TestCase):
+    def test_loads_aliases_and_continues_numbering(self):
+        aliases = AliasTable(Worksheet([['acme', 'C0007', ''], ['acme.com', 'C0007', '']]))
+        self.assertEqual(aliases.lookup('ACME Inc'), 'C0007')
+        self.assertEqual(aliases.lookup('', 'Jobs <jobs@acme.com>'), 'C0007')
+        self.assertEqual(aliases.new_id(), 'C0008')
+
+    def test_shared_domain_does_not_override_the_name(self):
+        aliases = AliasTable(Worksheet())
+        aliases.learn('Acme', 'Recruiter <talent@rippling.com>', 'C0001')
+        self.assertIsNone(aliases.lookup('Globex', 'Recruiter <talent@rippling.com>'))
+        self.assertEqual(aliases.lookup('Acme Corp', 'Recruiter <talent@rippling.com>'), 'C0001')
+        self.assertEqual(aliases.lookup('Acmee', 'Recruiter <talent@rippling.com>'), 'C0001')
+        self.assertEqual(aliases.lookup('', 'Recruiter <talent@rippling.com>'), 'C0001')
+
+    def test_remembered_names_are_not_written(self):
+        worksheet = Worksheet()
+        aliases = AliasTable(worksheet)
+        aliases.remember('Globex', 'C0002')
+        self.assertEqual(aliases.lookup('Globex Corporation'), 'C0002')
+        aliases.learn('Globex', 'Globex Careers <careers@globex.com>', 'C0002')
+        self.assertEqual(aliases.flush(), 1)
+        self.assertEqual(worksheet.appended, [['globex.com', 'C0002', '']])
+        self.assertEqual(aliases.flush(), 0)
+
+
+
+class IndexCompanyIdsTest(unittest.TestCase):
+    def test_new_ids_follow_ids_on_later_rows(self):
+        df = pd.DataFrame({'Company': ['Beta', 'Acme', 'Acme Inc', 'Gamma'],
+                           'Company ID': ['', 'C0001', '', 'C0004']})
+        rows = index_company_ids(df, AliasTable(Worksheet()))
+        self.assertEqual(list(df['Company ID']), ['C0005', 'C0001', 'C0001', 'C0004'])
+        self.assertEqual(rows, {'C0001': 1, 'C0004': 3, 'C0005': 0})
+
+    def test_blank_row_before_its_alias_is_the_first_row(self):
+        df = pd.DataFrame({'Company': ['Acme', 'Acme'], 'Company ID': ['', 'C0001']})
+        rows = index_company_ids(df, AliasTable(Worksheet()))
+        self.assertEqual(list(df['Company ID']), ['C0001', 'C0001'])
+        self.assertEqual(rows, {'C0001': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import os, sys, unittest
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.applications import ApplicationIndex, normalize_role
+
+
+def _index(rows):
+    return ApplicationIndex.from_frame(pd.DataFrame(rows, columns=['Company', 'Company ID', 'Role', 'Job ID']))
+
+
+class NormalizeRoleTest(unittest.TestCase):
+    def test_spellings_share_a_key(self):
+        self.assertEqual(normalize_role('Software Engineering Internship'), normalize_role('software engineering intern'))
+        self.assertEqual(normalize_role('Sr. Data Analyst'), 'senior data analyst')
+
+
+class ApplicationIndexTest(unittest.TestCase):
+    def test_same_title_different_requisitions(self):
+        index = _index([['Acme', 'C0001', 'Software Intern', 'R-1']])
+        self.assertEqual(index.find('C0001', 'Software Intern', 'R-1'), 0)
+        self.assertIsNone(index.find('C0001', 'Software Intern', 'R-2'))
+        index.add(1, 'C0001', 'Software Intern', 'R-2')
+        self.assertEqual(index.find('C0001', 'Software Intern', 'r-2'), 1)
+        self.assertEqual(index.find('C0001', 'Software Intern'), 0)
+
+    def test_role_without_job_id_adopts_the_job_id(self):
+        index = _index([['Acme', 'C0001', 'Software Intern', '']])
+        self.assertEqual(index.find('C0001', 'Software Intern', 'R-1'), 0)
+
+    def test_company_only_and_single_empty_row(self):
+        index = _index([['Acme', 'C0001', '', ''], ['Globex', 'C0002', 'Data Intern', '']])
+        self.assertEqual(index.find('C0001', 'Backend Intern'), 0)
+        self.assertEqual(index.find('C0002'), 1)
+        self.assertIsNone(index.find('C0002', 'Backend Intern'))
+        self.assertIsNone(index.find('C0003'))
+
+    def test_update_rekeys_the_row(self):
+        index = _index([['Acme', 'C0001', '', '']])
+        index.update(0, 'Backend Intern', 'R-9')
+        self.assertEqual(index.find('C0001', '', 'R-9'), 0)
+        self.assertIsNone(index.find('C0001', 'Frontend Intern'))
+
+
+if __name__ == '__main__':
+    unittest.main()
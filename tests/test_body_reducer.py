@@ -0,0 +1,51 @@
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.body_reducer import reduce_body
+
+MESSAGE = ('Hi Alex, congratulations! We are delighted to extend an offer for the Software Engineering Intern '
+           'position at Acme. Your start date is June 2 and your manager will be Jordan. ')
+
+
+class FooterTest(unittest.TestCase):
+    def test_lone_marker_in_the_message_is_kept(self):
+        body = (MESSAGE + 'Please review the privacy policy section of the offer packet, then sign the offer letter '
+                'by Friday to accept. Reply to this email with any questions.')
+        reduced, stats = reduce_body(body, max_tokens=0)
+        self.assertEqual(reduced, body)
+        self.assertNotIn('footer', stats['removed'])
+
+    def test_footer_block_is_removed(self):
+        footer = ('You are receiving this email because you applied on our careers site. Unsubscribe | '
+                  'Manage preferences | Privacy Policy. © 2024 Acme Inc. All rights reserved.')
+        reduced, stats = reduce_body(MESSAGE + 'Please sign by Friday to accept. ' + footer, max_tokens=0)
+        self.assertEqual(reduced, MESSAGE + 'Please sign by Friday to accept.')
+        self.assertIn('footer', stats['removed'])
+
+    def test_markers_far_from_the_end_are_kept(self):
+        body = MESSAGE + 'Unsubscribe and privacy policy details follow below. ' + 'Next steps are listed here. ' * 20
+        self.assertEqual(reduce_body(body, max_tokens=0)[0], body.strip())
+
+
+class ReplyChainTest(unittest.TestCase):
+    def test_quoted_reply_is_removed(self):
+        body = MESSAGE + 'On Mon, Jan 1, 2024 at 10:00 AM Alex <alex@example.com> wrote: Thanks for the update.'
+        self.assertEqual(reduce_body(body, max_tokens=0)[0], MESSAGE.strip())
+
+    def test_other_attribution_shapes(self):
+        for reply in ('On 2024-01-01, Alex wrote: hi', 'On Jan 1 at 9:30 alex@example.com wrote: hi'):
+            self.assertEqual(reduce_body(MESSAGE + reply, max_tokens=0)[0], MESSAGE.strip(), reply)
+
+    def test_prose_is_not_a_reply_chain(self):
+        for body in (
+            MESSAGE + 'Following up on your final round, the hiring manager wrote: we would love to extend '
+                      'you an offer.',
+            MESSAGE + 'On Friday the recruiter wrote: please confirm your start date.',
+            MESSAGE + 'Status: Careers > Applications > Intern > Rejected. Pay > $40/hr and hours > 20.',
+        ):
+            self.assertEqual(reduce_body(body, max_tokens=0)[0], body, body)
+
+
+if __name__ == '__main__':
+    unittest.main()
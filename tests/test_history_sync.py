@@ -0,0 +1,44 @@
+import json, os, sys, tempfile, types, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.history_sync import IncrementalSync
+
+
+def _request(result):
+    return types.SimpleNamespace(execute=lambda: result)
+
+
+class Service:
+    def users(self):
+        return self
+
+    def getProfile(self, userId):
+        return _request({'historyId': '999'})
+
+
+class FullSyncCheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'sync_state.json')
+        self.sync = IncrementalSync(Service(), 'Internships', 'processed', path=self.path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_failed_listing_saves_no_checkpoint(self):
+        self.sync.begin_full_sync()
+        # The full query raised before record_listed()
+        self.sync.commit([])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_completed_listing_keeps_unprocessed_messages_pending(self):
+        self.sync.begin_full_sync()
+        self.sync.record_listed([{'id': 'a', 'threadId': 't1'}, {'id': 'b', 'threadId': 't2'}])
+        self.sync.commit(['a'])
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {'history_id': '999', 'pending': [{'id': 'b', 'threadId': 't2'}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os, sys, time, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.html_text import _legacy_clean, html_to_text, sample_marketing_email
+
+
+def _words(text):
+    # html_to_text adds a space at block tags where the legacy pipeline ran words together
+    return text.replace(' ', '')
+
+
+class HtmlToTextTest(unittest.TestCase):
+    def assertSameText(self, markup):
+        self.assertEqual(_words(html_to_text(markup)), _words(_legacy_clean(markup)), markup)
+
+    def test_apostrophe_in_unquoted_attribute(self):
+        markup = "<td title=it's>Hello we're happy</td><p>Bye</p>"
+        self.assertEqual(html_to_text(markup), "Hello we're happy Bye")
+        self.assertSameText(markup)
+
+    def test_quoted_attributes_may_contain_brackets(self):
+        self.assertSameText('<a href="https://x.example/?a>b" title=\'a>b\'>Link</a> text')
+        self.assertSameText("<img alt='it>s'>after")
+        self.assertSameText('<p class="a" data-x = \'q\'>Q</p>')
+
+    def test_unclosed_style_and_script_are_dropped(self):
+        for markup in ('Hi <style>p{color:red}', 'Hi <script>var a = 1;', 'Hi <!-- hidden'):
+            self.assertEqual(html_to_text(markup), 'Hi', markup)
+            self.assertSameText(markup)
+
+    def test_unterminated_tag_with_many_attributes_is_fast(self):
+        markup = '<p>Hi</p><a ' + ' '.join(f'x{i}="v{i}"' for i in range(200)) + ' hello'
+        start = time.perf_counter()
+        text = html_to_text(markup)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertTrue(text.startswith('Hi <a x0="v0"'), text[:40])
+
+    def test_block_tags_separate_words(self):
+        self.assertEqual(html_to_text('<p>One</p><p>Two</p>a<br/>b<span>c</span>'), 'One Two a bc')
+
+    def test_entities_and_bare_angle_brackets(self):
+        self.assertSameText("<div>It's <b>bold</b> &amp; done</div>")
+        self.assertSameText('5 < 6 and 7 > 3')
+
+    def test_marketing_email(self):
+        markup = sample_marketing_email(20)
+        legacy = _legacy_clean(markup)
+        # The legacy pipeline leaves '} .btnN' remnants of nested CSS rules and the script's code
+        visible = legacy[legacy.index('Hi Alex'):legacy.index('window.dataLayer')]
+        self.assertEqual(_words(html_to_text(markup)), _words(visible))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import asyncio, os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.json_stream import JsonObjectScanner, StreamStats, aread_first_object, read_first_object
+
+
+def _chunks(texts, done=True):
+    parts = [{'message': {'content': text}, 'done': False} for text in texts]
+    if done:
+        parts.append({'message': {'content': ''}, 'done': True, 'eval_count': len(texts)})
+    return parts
+
+
+class Stream:
+    def __init__(self, parts):
+        self.parts = parts
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        for part in self.parts:
+            self.read += 1
+            yield part
+
+    async def _aiter(self):
+        for part in self.parts:
+            self.read += 1
+            yield part
+
+    def __aiter__(self):
+        return self._aiter()
+
+    def close(self):
+        self.closed = True
+
+    async def aclose(self):
+        self.closed = True
+
+
+class ScannerTest(unittest.TestCase):
+    def test_braces_in_strings(self):
+        scanner = JsonObjectScanner()
+        self.assertFalse(scanner.feed('noise {"Company": "{Ac'))
+        self.assertTrue(scanner.feed('me}\\\\", "x": {"y": 1}} trailing'))
+        self.assertEqual(scanner.object_text, '{"Company": "{Acme}\\\\", "x": {"y": 1}}')
+
+
+class ReadFirstObjectTest(unittest.TestCase):
+    def test_reply_that_ends_at_the_object_keeps_its_timings(self):
+        stats = StreamStats()
+        stream = Stream(_chunks(['{"Status"', ': "Received"', '}']))
+        text, final = read_first_object(stream, stats, num_predict=128)
+        self.assertEqual(text, '{"Status": "Received"}')
+        self.assertEqual(final['eval_count'], 3)
+        self.assertEqual((stats.requests, stats.cut_off, stats.tokens_saved), (1, 0, 0))
+        self.assertTrue(stream.closed)
+
+    def test_generation_after_the_object_is_cut_off(self):
+        stats = StreamStats()
+        stream = Stream(_chunks(['{"a": 1}', ' and', ' more', ' text'], done=True))
+        text, final = read_first_object(stream, stats, num_predict=128)
+        self.assertEqual(text, '{"a": 1}')
+        self.assertIsNone(final)
+        self.assertEqual(stream.read, 2)
+        self.assertEqual((stats.cut_off, stats.tokens_saved), (1, 126))
+
+    def test_async_reader_matches(self):
+        stats = StreamStats()
+        stream = Stream(_chunks(['{"a"', ': 1}']))
+        text, final = asyncio.run(aread_first_object(stream, stats, num_predict=64))
+        self.assertEqual(text, '{"a": 1}')
+        self.assertTrue(final['done'])
+        self.assertEqual(stats.cut_off, 0)
+        self.assertTrue(stream.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os, sqlite3, sys, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.message_store import MessageStore
+
+
+def _record(message_id, body):
+    return {'id': message_id, 'subject': 'Update', 'date': 'Mon, 1 Jan 2024', 'internal_date': 1,
+            'sender': 'Acme <no-reply@acme.com>', 'body': body}
+
+
+class ParserVersionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'messages.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_rows_from_another_parser_version_are_misses(self):
+        store = MessageStore(self.path, parser_version='2')
+        store.put(_record('m1', 'clean body'), {'threadId': 't1', 'payload': {}})
+        self.assertEqual(store.get_many(['m1'])['m1']['body'], 'clean body')
+        store.close()
+
+        store = MessageStore(self.path, parser_version='3')
+        self.assertEqual(store.get_many(['m1']), {})
+        store.put(_record('m1', 'cleaner body'), {'threadId': 't1', 'payload': {}})
+        self.assertEqual(store.get_many(['m1'])['m1']['body'], 'cleaner body')
+        store.close()
+
+    def test_store_without_parser_versions_is_upgraded(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute('CREATE TABLE messages (id TEXT PRIMARY KEY, thread_id TEXT, subject TEXT, sender TEXT, '
+                     'date TEXT, internal_date INTEGER, body TEXT, payload_meta TEXT, size INTEGER, '
+                     'stored_at REAL, last_used REAL)')
+        conn.execute("INSERT INTO messages VALUES ('m1', 't1', 'Update', 'Acme', 'Mon', 1, 'old body', '{}', 8, 0, 0)")
+        conn.commit()
+        conn.close()
+
+        store = MessageStore(self.path, parser_version='2')
+        self.assertEqual(store.get_many(['m1']), {})
+        store.put(_record('m2', 'new body'), {'threadId': 't2', 'payload': {}})
+        self.assertEqual(list(store.get_many(['m1', 'm2'])), ['m2'])
+        store.close()
+        self.assertEqual(MessageStore(self.path).stats()['messages'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
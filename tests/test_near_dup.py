@@ -0,0 +1,86 @@
+import os, sys, unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.near_dup import NUM_PERM, _A, _B, _PRIME, NearDuplicateIndex, minhash, universal_hash
+
+
+def _signature(hashes):
+    return universal_hash(np.array(sorted(hashes), dtype=np.uint64)).min(axis=1)
+
+
+def _estimate(first, second):
+    return float(np.mean(_signature(first) == _signature(second)))
+
+
+class UniversalHashTest(unittest.TestCase):
+    def test_matches_exact_arithmetic(self):
+        hashes = np.array([0, 1, 2, 12345, 2**31, 2**32 - 1], dtype=np.uint64)
+        expected = [[(int(a) * int(h) + int(b)) % _PRIME for h in hashes] for a, b in zip(_A, _B)]
+        self.assertTrue((universal_hash(hashes) == np.array(expected, dtype=np.uint64)).all())
+
+
+class MinHashTest(unittest.TestCase):
+    def test_estimate_tracks_jaccard(self):
+        rng = np.random.default_rng(1)
+        errors = []
+        for _ in range(300):
+            jaccard = rng.uniform(0.0, 1.0)
+            size = int(rng.integers(50, 300))
+            universe = rng.choice(2**32, size=size * 2, replace=False)
+            shared = int(round(jaccard * size))
+            first = set(universe[:size])
+            second = set(universe[:shared]) | set(universe[size:2 * size - shared])
+            exact = len(first & second) / len(first | second)
+            errors.append(_estimate(first, second) - exact)
+        # Standard deviation of a NUM_PERM-sample estimate is at most 0.5 / sqrt(NUM_PERM)
+        self.assertLess(np.std(errors), 0.5 / np.sqrt(NUM_PERM) * 1.3)
+        self.assertLess(abs(np.mean(errors)), 0.02)
+
+    def test_dissimilar_pairs_stay_below_threshold(self):
+        rng = np.random.default_rng(2)
+        for _ in range(300):
+            universe = rng.choice(2**32, size=400, replace=False)
+            first = set(universe[:200])
+            second = set(universe[:90]) | set(universe[200:310])
+            self.assertLess(_estimate(first, second), 0.8)
+
+    def test_near_identical_pairs_stay_above_threshold(self):
+        rng = np.random.default_rng(3)
+        for _ in range(300):
+            universe = rng.choice(2**32, size=206, replace=False)
+            first = set(universe[:200])
+            second = set(universe[3:203])
+            self.assertGreaterEqual(_estimate(first, second), 0.8)
+
+    def test_templated_emails_match(self):
+        body = ('Thank you for your interest in the position. After careful review of your application our '
+                'team has decided to move forward with other candidates whose experience more closely '
+                'matches our needs at this time. We encourage you to apply again in the future.')
+        first = minhash(f'Hi Alex, requisition R-10423. {body}')
+        second = minhash(f'Hi Sam, requisition R-99812. {body}')
+        other = minhash('We would like to invite you to a technical interview next week. Please pick a time '
+                        'that works for you using the scheduling link below and prepare a short demo.')
+        self.assertGreaterEqual(float(np.mean(first == second)), 0.8)
+        self.assertLess(float(np.mean(first == other)), 0.2)
+
+
+class NearDuplicateIndexTest(unittest.TestCase):
+    def test_removed_representative_is_not_found(self):
+        body = ('Thank you for your interest in the position. After careful review of your application our '
+                'team has decided to move forward with other candidates whose experience more closely '
+                'matches our needs at this time. We encourage you to apply again in the future.')
+        index = NearDuplicateIndex()
+        index.add('first', minhash(f'Hi Alex, requisition R-10423. {body}'))
+        signature = minhash(f'Hi Sam, requisition R-99812. {body}')
+        self.assertEqual(index.find(signature), 'first')
+        index.remove('first')
+        self.assertIsNone(index.find(signature))
+        self.assertEqual(index.buckets, {})
+        index.add('second', signature)
+        self.assertEqual(index.find(minhash(f'Hi Alex, requisition R-10423. {body}')), 'second')
+
+
+if __name__ == '__main__':
+    unittest.main()
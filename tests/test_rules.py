@@ -0,0 +1,97 @@
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.rules import RuleClassifier, extract_company
+
+
+def _email(body, subject='Your application', sender='Acme Recruiting <no-reply@greenhouse.io>'):
+    return {'id': 'm1', 'subject': subject, 'sender': sender, 'body': body}
+
+
+class RuleStatusTest(unittest.TestCase):
+    def setUp(self):
+        self.rules = RuleClassifier()
+
+    def status(self, body, **kwargs):
+        result = self.rules.classify(_email(body, **kwargs))
+        return result and result['Status']
+
+    def test_acknowledgement_is_received(self):
+        self.assertEqual(self.status('Thank you for applying to Acme. We have received your application '
+                                     'and our team will review it.'), 'Received')
+
+    def test_rejections_are_rejected(self):
+        for body in (
+            'Thanks for applying. Unfortunately we have decided not to move forward with your application.',
+            'Thank you for applying to Acme. We are unable to move forward with your candidacy.',
+            'Thank you for your application to Acme. We will not be moving forward at this time.',
+            'Thank you for applying to Acme. We regret to inform you that the position has been filled.',
+        ):
+            self.assertEqual(self.status(body), 'Rejected', body)
+
+    def test_unlisted_bad_news_goes_to_the_model(self):
+        for body in (
+            'Thank you for applying to Acme. Unfortunately the team went in a different direction.',
+            'Thank you for applying to Acme. We decided not to continue with your application.',
+            'Thank you for applying to Acme. We have chosen other applicants for this role.',
+            'Thank you for applying to Acme. We will not be able to move forward with your application.',
+            'Thank you for applying to Acme. After review we have decided to pursue candidates whose '
+            'experience more closely matches the role.',
+            'Thank you for applying to Acme. We have made a decision on the role.',
+        ):
+            self.assertIsNone(self.status(body), body)
+
+    def test_long_acknowledgement_goes_to_the_model(self):
+        body = ('Thank you for applying to Acme. We have received your application. ' +
+                'Our hiring team reviewed every profile carefully and the outcome is described below. ' * 5)
+        self.assertIsNone(self.status(body))
+
+    def test_interviews_go_to_the_model(self):
+        self.assertIsNone(self.status('Thank you for applying to Acme. We would like to schedule an interview.'))
+
+
+
+class ExtractCompanyTest(unittest.TestCase):
+    def company(self, body, subject='Your application', sender='Acme Recruiting <no-reply@greenhouse.io>'):
+        return extract_company(_email(body, subject=subject, sender=sender))
+
+    def test_phrase_in_body(self):
+        self.assertEqual(self.company('Thank you for applying to Globex. We received your application.'), 'Globex')
+
+    def test_sender_display_name(self):
+        self.assertEqual(self.company('We received your application.'), 'Acme')
+
+    def test_sender_domain(self):
+        self.assertEqual(self.company('We received your application.', sender='jobs@initech.com'), 'Initech')
+
+    def test_workday_mailbox(self):
+        self.assertEqual(self.company('We received your application.', sender='umbrella_corp@myworkday.com'),
+                         'Umbrella Corp')
+
+    def test_job_boards_are_not_companies(self):
+        for sender in ('Indeed Jobs <alerts@indeed.com>', 'LinkedIn Jobs <jobs-noreply@linkedin.com>',
+                       'Handshake Team <team@joinhandshake.com>'):
+            self.assertEqual(self.company('Your application was sent.', sender=sender), '', sender)
+
+    def test_role_is_not_a_company(self):
+        body = 'Thank you for your interest in Software Engineering Internship Summer 2025.'
+        self.assertEqual(self.company(body, sender='no-reply@greenhouse.io'), '')
+        # The sender still names the company when the phrase is a role
+        self.assertEqual(self.company(body), 'Acme')
+
+    def test_seasons_and_years_are_not_companies(self):
+        sender = 'no-reply@greenhouse.io'
+        self.assertEqual(self.company('Thank you for your interest in Summer 2025 opportunities at Acme.',
+                                      sender=sender), 'Acme')
+        self.assertEqual(self.company('Thank you for your interest in 2025 Internships with Globex.',
+                                      sender=sender), 'Globex')
+
+    def test_role_words_reject_candidates(self):
+        for body in ('Thank you for applying to Data Analyst Intern.',
+                     'Thank you for your interest in Backend Engineer.'):
+            self.assertEqual(self.company(body, sender='no-reply@lever.co'), '', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import json, os, sys, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.session import MIN_CTX, ModelSession, context_size
+
+
+class ContextSizeTest(unittest.TestCase):
+    def test_rounds_and_clamps(self):
+        self.assertEqual(context_size([100], 128), MIN_CTX)
+        self.assertEqual(context_size([4000], 128), 4608)
+
+
+class RecordTest(unittest.TestCase):
+    def test_cached_prefix_does_not_shrink_the_prompt_size(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'session_stats.json')
+            session = ModelSession('m', 3000, path=path)
+            messages = [{'role': 'system', 'content': 'x' * 8000}, {'role': 'user', 'content': 'y' * 400}]
+            # Ollama only counts the tokens it evaluated after the cached instruction prefix
+            session.record({'prompt_eval_count': 100, 'eval_count': 20}, messages)
+            session.record(None, messages)
+            self.assertEqual(session.prompt_tokens, [2100, 2100])
+            self.assertEqual(len(session.calls), 1)
+            session.close()
+            with open(path) as f:
+                self.assertEqual(json.load(f)[session.key], [2100, 2100])
+            self.assertEqual(ModelSession('m', 3000, path=path).num_ctx, context_size([2100], 128))
+
+
+if __name__ == '__main__':
+    unittest.main()